@@ -1,8 +1,18 @@
+import argparse
 import csv
-import requests
-from bs4 import BeautifulSoup
+import os
+import asyncio
+import concurrent.futures
+import aiohttp
+import lxml.etree
+import lxml.html
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError: # selectolax absent : repli sur lxml
+    LexborHTMLParser = None
 import re
-import time
+from urllib.parse import urlparse
+from tqdm import tqdm
 
 # Définition des indicateurs connus (listes non exhaustives)
 DYNAMIC_URL_EXTENSIONS = ('.php', '.asp', '.aspx', '.jsp', '.py', '.rb', '.cgi')
@@ -14,125 +24,303 @@ DYNAMIC_POWERED_BY_KEYWORDS = ['php', 'asp.net', 'express', 'ruby', 'python', 'j
 SSG_GENERATORS_KEYWORDS = ['jekyll', 'hugo', 'gatsby', 'eleventy', 'vuepress', 'mkdocs', 'pelican', 'gridsome', 'astro']
 # Attention : Next.js peut être statique (SSG) ou dynamique (SSR/ISR).
 # La présence de 'next.js' dans le generator est un indicateur, mais pas une preuve de staticité.
+# Noms de cookies typiques de session
+SESSION_COOKIE_NAMES = ['phpsessid', 'jsessionid', 'asp.net_sessionid', 'sessionid', 'connect.sid']
 
-def classify_website(url):
+# En-têtes ajoutés par les CDN / proxys applicatifs (Cloudflare, CloudFront)
+CDN_HEADERS = ('CF-Ray', 'X-Amz-Cf-Id')
+
+# Sélecteurs CSS utilisés avec selectolax (insensibles à la casse via le drapeau 'i')
+GENERATOR_SELECTOR = 'meta[name="generator" i]'
+POST_FORM_SELECTOR = 'form[method="post" i]'
+# Équivalents XPath précompilés pour le repli lxml (insensibles à la casse via translate())
+GENERATOR_XPATH = lxml.etree.XPath("//meta[translate(@name, 'GENERATOR', 'generator')='generator']/@content")
+POST_FORM_ACTIONS_XPATH = lxml.etree.XPath("//form[translate(@method, 'POST', 'post')='post']/@action")
+
+# Chaque liste de mots-clés est compilée en une seule alternative : une recherche au lieu d'une boucle any(...)
+DYNAMIC_POWERED_BY_RE = re.compile('|'.join(map(re.escape, DYNAMIC_POWERED_BY_KEYWORDS)), re.I)
+SESSION_COOKIE_RE = re.compile('|'.join(map(re.escape, SESSION_COOKIE_NAMES)), re.I)
+CMS_GEN_RE = re.compile('|'.join(map(re.escape, CMS_GENERATORS_KEYWORDS)), re.I)
+SSG_GEN_RE = re.compile('|'.join(map(re.escape, SSG_GENERATORS_KEYWORDS)), re.I)
+# Extensions dynamiques en fin de chemin (la query string et le fragment sont ignorés)
+DYNAMIC_EXT_RE = re.compile('(?:' + '|'.join(map(re.escape, DYNAMIC_URL_EXTENSIONS)) + ')(?:$|[?#])', re.I)
+# Empreintes de CMS courants (WordPress, Drupal, Joomla), recherchées directement dans les octets bruts
+CMS_FINGERPRINT_RE = re.compile(rb'wp-content/|wp-includes/|/wp-json/|sites/default/files|misc/drupal\.js|components/com_content|/media/jui/js/', re.I)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36 SiteClassifierBot/1.0'
+}
+# Timeout raisonnable pour chaque requête
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=20)
+# Taille maximale du corps lu par page : <head> et début de <body> suffisent aux heuristiques
+MAX_BYTES = 64 * 1024
+# Taille du tampon d'écriture des fichiers CSV de sortie
+OUTPUT_BUFFER_SIZE = 1 << 20
+# Nombre maximal de requêtes simultanées (toutes URLs confondues)
+MAX_CONCURRENCY = 20
+# Nombre maximal de requêtes simultanées vers un même domaine (politesse envers les serveurs)
+PER_HOST_CONCURRENCY = 1
+
+# Classification déjà obtenue pour chaque domaine (netloc) pendant l'exécution
+_HOST_CACHE: dict[str, str] = {}
+
+
+def normalize_url(url):
+    """Ajoute http:// si aucun schéma n'est présent."""
+    if not re.match(r'^[a-zA-Z]+://', url):
+        url = 'http://' + url
+    return url
+
+
+def host_of(url):
+    """Retourne le domaine (netloc) d'une URL, schéma ajouté si besoin."""
+    return urlparse(normalize_url(url)).netloc
+
+
+def classify_from_headers(headers, final_url):
+    """
+    Applique les heuristiques basées sur les en-têtes HTTP et l'URL finale.
+    Retourne 'dynamic' si un indicateur fort est trouvé, sinon None (non concluant).
+    """
+    # 1. Vérifier l'en-tête 'X-Powered-By'
+    if DYNAMIC_POWERED_BY_RE.search(headers.get('X-Powered-By', '')):
+        return 'dynamic'
+
+    # 2. Vérifier les extensions d'URL dynamiques courantes
+    # Attention : final_url est l'URL finale après redirections
+    if DYNAMIC_EXT_RE.search(final_url):
+        return 'dynamic'
+
+    # 3. Vérifier l'en-tête 'Set-Cookie' (présence de cookies de session)
+    # C'est un indicateur, mais les sites statiques peuvent aussi utiliser des cookies via JS.
+    if 'Set-Cookie' in headers:
+        # Rechercher des cookies typiques de session
+        if SESSION_COOKIE_RE.search(', '.join(headers.getall('Set-Cookie'))):
+            return 'dynamic'
+
+    return None
+
+
+def classify_from_cdn_headers(headers):
+    """
+    Détecte un CDN / proxy applicatif (Cloudflare, CloudFront) à partir des en-têtes,
+    y compris sur une réponse 4xx : ces plateformes impliquent une diffusion dynamique.
+    Retourne 'dynamic' ou None.
+    """
+    if 'cloudflare' in headers.get('Server', '').lower():
+        return 'dynamic'
+    if any(header in headers for header in CDN_HEADERS):
+        return 'dynamic'
+    return None
+
+
+def classify_from_url(final_url):
+    """Heuristique de repli lorsque ni les en-têtes ni le contenu ne sont concluants."""
+    # 5. Si l'URL finale se termine par .html ou .htm
+    # ET qu'aucun indicateur dynamique fort n'a été trouvé, considérer comme statique.
+    if final_url.endswith(('.html', '.htm')):
+        return 'static'
+
+    # 6. Comportement par défaut : si après toutes ces vérifications, aucun signal clair n'est trouvé,
+    # on doit faire un choix. Beaucoup de sites modernes sont dynamiques ou ont des aspects dynamiques.
+    # Par défaut, on peut pencher vers 'dynamic'.
+    return 'dynamic'
+
+
+def parse_html(body, encoding=None):
+    """Construit l'arbre lxml du document, ou retourne None si le contenu n'est pas analysable."""
+    try:
+        parser = lxml.html.HTMLParser(encoding=encoding) if encoding else None
+        return lxml.html.document_fromstring(body, parser=parser)
+    except LookupError:
+        # Encodage annoncé inconnu : on laisse lxml le détecter
+        return parse_html(body) if encoding else None
+    except (lxml.etree.ParserError, ValueError):
+        return None
+
+
+def extract_html_signals(body, charset=None):
+    """
+    Extrait du HTML le contenu du <meta name="generator"> (en minuscules, '' si absent)
+    et la liste des actions des formulaires POST.
+    Utilise selectolax (lexbor) s'il est installé, bien plus rapide en lecture seule, sinon lxml.
+    """
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(body)
+        generator_content = next(
+            (content for content in (node.attributes.get('content') for node in tree.css(GENERATOR_SELECTOR)) if content), ''
+        )
+        post_form_actions = [action for action in (node.attributes.get('action') for node in tree.css(POST_FORM_SELECTOR)) if action]
+        return generator_content.lower(), post_form_actions
+
+    # Arbre lxml (extension C) ; l'encodage annoncé par le serveur évite la détection automatique
+    tree = parse_html(body, charset)
+    if tree is None:
+        return '', []
+    generator_content = next((content for content in GENERATOR_XPATH(tree) if content), '')
+    return generator_content.lower(), POST_FORM_ACTIONS_XPATH(tree)
+
+
+def classify_from_body(body, content_type, charset, final_url):
+    """
+    Applique les heuristiques basées sur le contenu de la page, puis l'heuristique de repli.
+    Fonction pure (sans accès réseau) : elle peut être exécutée dans un ProcessPoolExecutor,
+    d'où des arguments simples (octets et chaînes) peu coûteux à sérialiser.
+    """
+    # 4. Analyser le contenu HTML (si c'en est)
+    if 'text/html' in content_type:
+        generator_content, post_form_actions = extract_html_signals(body, charset)
+
+        # Vérifier les balises <meta name="generator">
+        if generator_content:
+            if CMS_GEN_RE.search(generator_content):
+                return 'dynamic'
+            if SSG_GEN_RE.search(generator_content):
+                # Si c'est Next.js, il faut être prudent.
+                # Sans analyse plus poussée de __NEXT_DATA__, on peut avoir un faux positif pour statique.
+                # Pour simplifier, si c'est un SSG connu (hors Next.js avec plus de doutes), on penche vers statique.
+                if 'next.js' not in generator_content: # Next.js est plus ambigu
+                     return 'static'
+                # Pour Next.js, on laisse d'autres règles potentiellement le classer dynamique, ou il tombera dans le défaut.
+
+        # Vérifier les empreintes de CMS courants (WordPress, Drupal, Joomla)
+        # directement sur les octets bruts : pas de re-sérialisation de l'arbre ni de .lower()
+        if CMS_FINGERPRINT_RE.search(body):
+            return 'dynamic'
+
+
+        # Vérifier les formulaires POST pointant vers des scripts dynamiques (heuristique simple)
+        # Les formulaires POST avec une action relative non triviale pourraient aussi suggérer
+        # un site dynamique, mais ce critère serait trop agressif.
+        for action in post_form_actions:
+            if DYNAMIC_EXT_RE.search(action):
+                return 'dynamic'
+
+    return classify_from_url(final_url)
+
+
+async def read_capped(response, max_bytes=MAX_BYTES):
+    """Lit au plus max_bytes octets (décompressés) du corps de la réponse, sans télécharger le reste."""
+    body = bytearray()
+    while len(body) < max_bytes:
+        chunk = await response.content.read(max_bytes - len(body))
+        if not chunk:
+            break
+        body += chunk
+    return bytes(body)
+
+
+def create_session():
+    """
+    Crée la session HTTP partagée par toutes les requêtes : le pool de connexions
+    (keep-alive) est réutilisé pour les redirections et les requêtes HEAD puis GET.
+    """
+    # aiohttp utilise automatiquement aiodns (résolution DNS non bloquante) et Brotli s'ils sont installés.
+    # Le cache DNS du connecteur évite de résoudre à nouveau un domaine déjà vu pendant l'exécution.
+    connector = aiohttp.TCPConnector(limit=50, use_dns_cache=True, ttl_dns_cache=300)
+    return aiohttp.ClientSession(connector=connector, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+
+
+async def classify_website(session, url, parse_pool=None, use_host_cache=True):
     """
     Inspecte une URL pour tenter de déterminer si le site est statique ou dynamique.
     Retourne 'static', 'dynamic', ou une chaîne d'erreur (ex: 'error_timeout').
+
+    Les URLs d'un même domaine reçoivent presque toujours la même classification :
+    si use_host_cache est vrai, le résultat déjà obtenu pour le domaine est réutilisé
+    sans requête ni analyse (les erreurs ne sont pas mises en cache).
     """
-    if not re.match(r'^[a-zA-Z]+://', url): # Ajoute http si aucun schéma n'est présent
-        url = 'http://' + url
+    host = host_of(url)
+    if use_host_cache:
+        cached = _HOST_CACHE.get(host)
+        if cached is not None:
+            return cached
+
+    result = await classify_website_uncached(session, url, parse_pool)
+    if use_host_cache and result in ('static', 'dynamic'):
+        _HOST_CACHE[host] = result
+    return result
+
+
+async def classify_website_uncached(session, url, parse_pool=None):
+    """
+    Classifie une URL sans passer par le cache par domaine (voir classify_website).
+
+    Une requête HEAD est envoyée d'abord : le corps de la page n'est téléchargé
+    et analysé que si les en-têtes ne suffisent pas à conclure.
+    Si parse_pool (un ProcessPoolExecutor) est fourni, l'analyse HTML, coûteuse en CPU,
+    y est déléguée pour ne pas bloquer la boucle d'événements.
+    """
+    url = normalize_url(url)
 
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36 SiteClassifierBot/1.0'
-        }
-        # Timeout raisonnable pour la requête
-        response = requests.get(url, headers=headers, timeout=20, allow_redirects=True)
-        response.raise_for_status() # Lève une exception pour les codes d'erreur HTTP (4xx, 5xx)
-
-        # 1. Vérifier l'en-tête 'X-Powered-By'
-        powered_by = response.headers.get('X-Powered-By', '').lower()
-        if any(tech_keyword in powered_by for tech_keyword in DYNAMIC_POWERED_BY_KEYWORDS):
-            return 'dynamic'
+        async with session.head(url, allow_redirects=True) as response:
+            # Certains serveurs refusent HEAD (405, 403...) : on se rabat alors sur GET
+            if response.status < 400:
+                final_url = str(response.url).lower()
+                verdict = classify_from_headers(response.headers, final_url)
+                if verdict:
+                    return verdict
+                # Contenu non HTML annoncé : inutile de télécharger le corps
+                content_type = response.headers.get('Content-Type', '').lower()
+                if content_type and 'text/html' not in content_type:
+                    return classify_from_url(final_url)
 
-        # 2. Vérifier les extensions d'URL dynamiques courantes
-        # Attention : response.url contient l'URL finale après redirections
-        final_url = response.url.lower()
-        if any(final_url.endswith(ext) for ext in DYNAMIC_URL_EXTENSIONS):
-            return 'dynamic'
-        
-        # 3. Vérifier l'en-tête 'Set-Cookie' (présence de cookies de session)
-        # C'est un indicateur, mais les sites statiques peuvent aussi utiliser des cookies via JS.
-        if 'Set-Cookie' in response.headers:
-            # Rechercher des cookies typiques de session
-            cookies_header = response.headers['Set-Cookie'].lower()
-            if any(s_cookie_name in cookies_header for s_cookie_name in ['phpsessid', 'jsessionid', 'asp.net_sessionid', 'sessionid', 'connect.sid']):
-                 return 'dynamic'
+        async with session.get(url, allow_redirects=True) as response:
+            # Codes d'erreur HTTP traités sans raise_for_status() : pas d'exception à construire,
+            # et les en-têtes d'une réponse 4xx (protection anti-robots) restent exploitables
+            if response.status >= 500:
+                tqdm.write(f"Erreur HTTP {response.status} pour l'URL : {url}")
+                return 'error_request'
+            if response.status >= 400:
+                verdict = classify_from_headers(response.headers, str(response.url).lower()) or classify_from_cdn_headers(response.headers)
+                if verdict:
+                    return verdict
+                tqdm.write(f"Erreur HTTP {response.status} pour l'URL : {url}")
+                return 'error_request'
+            body = await read_capped(response)
 
+        # Les en-têtes du GET peuvent différer de ceux du HEAD (cookies de session notamment)
+        final_url = str(response.url).lower()
+        verdict = classify_from_headers(response.headers, final_url)
+        if verdict:
+            return verdict
 
-        # 4. Analyser le contenu HTML (si c'en est)
+        # 4. Analyser le contenu HTML, hors de la boucle d'événements si un pool est fourni
         content_type = response.headers.get('Content-Type', '').lower()
-        if 'text/html' in content_type:
-            soup = BeautifulSoup(response.content, 'html.parser') # Utiliser response.content pour une meilleure gestion de l'encodage
-            html_lower = str(soup).lower() # Contenu HTML en minuscules pour la recherche
-
-            # Vérifier les balises <meta name="generator">
-            generator_meta = soup.find('meta', attrs={'name': re.compile(r'^generator$', re.I)})
-            if generator_meta and generator_meta.get('content'):
-                generator_content = generator_meta.get('content', '').lower()
-                if any(cms_keyword in generator_content for cms_keyword in CMS_GENERATORS_KEYWORDS):
-                    return 'dynamic'
-                if any(ssg_keyword in generator_content for ssg_keyword in SSG_GENERATORS_KEYWORDS):
-                    # Si c'est Next.js, il faut être prudent.
-                    # Sans analyse plus poussée de __NEXT_DATA__, on peut avoir un faux positif pour statique.
-                    # Pour simplifier, si c'est un SSG connu (hors Next.js avec plus de doutes), on penche vers statique.
-                    if 'next.js' not in generator_content: # Next.js est plus ambigu
-                         return 'static'
-                    # Pour Next.js, on laisse d'autres règles potentiellement le classer dynamique, ou il tombera dans le défaut.
-
-            # Vérifier les empreintes de CMS courants (ex: WordPress)
-            if 'wp-content/' in html_lower or 'wp-includes/' in html_lower or '/wp-json/' in html_lower:
-                return 'dynamic'
-            if 'sites/default/files' in html_lower or 'misc/drupal.js' in html_lower: # Drupal
-                return 'dynamic'
-            if 'components/com_content' in html_lower or '/media/jui/js/' in html_lower: # Joomla
-                 return 'dynamic'
-
-
-            # Vérifier les formulaires pointant vers des scripts dynamiques (heuristique simple)
-            forms = soup.find_all('form')
-            for form in forms:
-                action = form.get('action', '').lower()
-                method = form.get('method', '').lower()
-                if method == 'post' and action: # Les formulaires POST sont souvent dynamiques
-                    if any(action.endswith(ext) for ext in DYNAMIC_URL_EXTENSIONS):
-                        return 'dynamic'
-                    # Si l'action est une URL relative non vide, cela peut indiquer un traitement dynamique.
-                    if not action.startswith(('http', '#', 'javascript:')) and action != '':
-                        # Heuristique : un formulaire POST avec une action non triviale suggère dynamique.
-                        #return 'dynamic' # Peut être trop agressif.
-                        pass
-
-
-        # 5. Heuristique de repli : si l'URL finale se termine par .html ou .htm
-        # ET qu'aucun indicateur dynamique fort n'a été trouvé, considérer comme statique.
-        if final_url.endswith(('.html', '.htm')):
-            return 'static'
-
-        # 6. Comportement par défaut : si après toutes ces vérifications, aucun signal clair n'est trouvé,
-        # on doit faire un choix. Beaucoup de sites modernes sont dynamiques ou ont des aspects dynamiques.
-        # Par défaut, on peut pencher vers 'dynamic'.
-        return 'dynamic'
+        if parse_pool is None:
+            return classify_from_body(body, content_type, response.charset, final_url)
+        return await asyncio.get_running_loop().run_in_executor(
+            parse_pool, classify_from_body, body, content_type, response.charset, final_url
+        )
 
-    except requests.exceptions.Timeout:
-        print(f"Timeout pour l'URL : {url}")
+    except asyncio.TimeoutError:
+        tqdm.write(f"Timeout pour l'URL : {url}")
         return 'error_timeout'
-    except requests.exceptions.TooManyRedirects:
-        print(f"Trop de redirections pour l'URL : {url}")
+    except aiohttp.TooManyRedirects:
+        tqdm.write(f"Trop de redirections pour l'URL : {url}")
         return 'error_redirects'
-    except requests.exceptions.SSLError:
-        print(f"Erreur SSL pour l'URL : {url}")
+    except aiohttp.ClientSSLError:
+        tqdm.write(f"Erreur SSL pour l'URL : {url}")
         return 'error_ssl'
-    except requests.exceptions.ConnectionError:
-        print(f"Erreur de connexion pour l'URL : {url}")
+    except aiohttp.ClientConnectorError:
+        tqdm.write(f"Erreur de connexion pour l'URL : {url}")
         return 'error_connection'
-    except requests.exceptions.RequestException as e:
-        print(f"Erreur de requête pour l'URL {url}: {e}")
+    except aiohttp.ClientError as e:
+        tqdm.write(f"Erreur de requête pour l'URL {url}: {e}")
         return 'error_request'
     except Exception as e:
-        print(f"Erreur inattendue avec l'URL {url}: {e}")
+        tqdm.write(f"Erreur inattendue avec l'URL {url}: {e}")
         return 'error_unexpected'
 
 
-def main_process(input_csv_path, static_csv_path, dynamic_csv_path, error_csv_path):
+async def main_process(input_csv_path, static_csv_path, dynamic_csv_path, error_csv_path, use_host_cache=True):
     """
     Fonction principale pour lire le CSV d'entrée, classifier les URLs et écrire les résultats.
+    Les URLs sont traitées en parallèle (au plus MAX_CONCURRENCY requêtes en vol,
+    et PER_HOST_CONCURRENCY par domaine) et chaque résultat est écrit dès qu'il est connu.
+    use_host_cache=False force l'inspection de chaque URL (utile pour un audit).
     """
-    static_sites_urls = []
-    dynamic_sites_urls = []
-    error_sites_info = []
-
     print(f"Lecture du fichier d'entrée : {input_csv_path}")
     try:
         with open(input_csv_path, mode='r', newline='', encoding='utf-8') as infile:
@@ -141,60 +329,76 @@ def main_process(input_csv_path, static_csv_path, dynamic_csv_path, error_csv_pa
             # next(reader, None) 
             
             urls_to_process = [row[0].strip() for row in reader if row and row[0].strip()]
-            
-            total_urls = len(urls_to_process)
-            print(f"Nombre total d'URLs à traiter : {total_urls}")
-
-            for i, url in enumerate(urls_to_process):
-                print(f"\nTraitement de l'URL {i+1}/{total_urls} : {url}")
-                
-                # Petit délai pour être respectueux envers les serveurs
-                time.sleep(0.75) # Délai de 0.75 seconde
-                
-                classification_result = classify_website(url)
-                
-                if classification_result == 'static':
-                    static_sites_urls.append([url])
-                    print(f" -> Classification : STATIQUE")
-                elif classification_result == 'dynamic':
-                    dynamic_sites_urls.append([url])
-                    print(f" -> Classification : DYNAMIQUE")
-                else: # C'est une erreur
-                    error_sites_info.append([url, classification_result])
-                    print(f" -> Classification : ERREUR ({classification_result})")
-
     except FileNotFoundError:
         print(f"ERREUR : Le fichier d'entrée '{input_csv_path}' n'a pas été trouvé.")
         return
     except Exception as e:
-        print(f"ERREUR lors de la lecture ou du traitement du CSV d'entrée : {e}")
+        print(f"ERREUR lors de la lecture du CSV d'entrée : {e}")
         return
 
-    # Écriture des résultats dans les fichiers CSV de sortie
+    total_urls = len(urls_to_process)
+    print(f"Nombre total d'URLs à traiter : {total_urls}")
+
+    # Regrouper les URLs par domaine (tri stable) : les premières requêtes d'un domaine
+    # amorcent le cache DNS et le pool de connexions pour les suivantes
+    urls_to_process.sort(key=host_of)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    host_semaphores = {}
+    counts = {'static': 0, 'dynamic': 0, 'error': 0}
+
+    # Les résultats sont écrits au fil de l'eau dans les fichiers CSV de sortie,
+    # avec un tampon de 1 Mio pour limiter le nombre d'appels système
     try:
-        with open(static_csv_path, mode='w', newline='', encoding='utf-8') as outfile_static:
+        with open(static_csv_path, mode='w', newline='', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as outfile_static, \
+                open(dynamic_csv_path, mode='w', newline='', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as outfile_dynamic, \
+                open(error_csv_path, mode='w', newline='', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as outfile_error:
             writer_static = csv.writer(outfile_static)
             writer_static.writerow(['URL']) # En-tête
-            writer_static.writerows(static_sites_urls)
-        print(f"\nListe des sites statiques sauvegardée dans : {static_csv_path} ({len(static_sites_urls)} sites)")
-
-        with open(dynamic_csv_path, mode='w', newline='', encoding='utf-8') as outfile_dynamic:
             writer_dynamic = csv.writer(outfile_dynamic)
             writer_dynamic.writerow(['URL']) # En-tête
-            writer_dynamic.writerows(dynamic_sites_urls)
-        print(f"Liste des sites dynamiques sauvegardée dans : {dynamic_csv_path} ({len(dynamic_sites_urls)} sites)")
-
-        if error_sites_info:
-            with open(error_csv_path, mode='w', newline='', encoding='utf-8') as outfile_error:
-                writer_error = csv.writer(outfile_error)
-                writer_error.writerow(['URL', 'TypeErreur']) # En-tête
-                writer_error.writerows(error_sites_info)
-            print(f"Liste des URLs en erreur sauvegardée dans : {error_csv_path} ({len(error_sites_info)} erreurs)")
-        else:
-            print("Aucune erreur rencontrée lors du traitement des URLs.")
+            writer_error = csv.writer(outfile_error)
+            writer_error.writerow(['URL', 'TypeErreur']) # En-tête
+
+            async def classify_bounded(session, url):
+                # Politesse par domaine plutôt qu'un délai global entre toutes les requêtes
+                host = host_of(url)
+                host_semaphore = host_semaphores.setdefault(host, asyncio.Semaphore(PER_HOST_CONCURRENCY))
+                async with host_semaphore:
+                    async with semaphore:
+                        classification_result = await classify_website(session, url, parse_pool, use_host_cache)
+
+                # Seules les erreurs sont affichées (par classify_website) ; la progression passe par la barre tqdm
+                if classification_result == 'static':
+                    writer_static.writerow([url])
+                    counts['static'] += 1
+                elif classification_result == 'dynamic':
+                    writer_dynamic.writerow([url])
+                    counts['dynamic'] += 1
+                else: # C'est une erreur
+                    writer_error.writerow([url, classification_result])
+                    counts['error'] += 1
+                progress.update(1)
+
+            # L'analyse HTML est répartie sur tous les cœurs
+            with concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count()) as parse_pool, \
+                    tqdm(total=total_urls, unit='url') as progress:
+                async with create_session() as session:
+                    await asyncio.gather(*(classify_bounded(session, url) for url in urls_to_process))
 
     except IOError as e:
         print(f"ERREUR lors de l'écriture des fichiers CSV de sortie : {e}")
+        return
+    except Exception as e:
+        print(f"ERREUR lors du traitement des URLs : {e}")
+        return
+
+    print(f"\nListe des sites statiques sauvegardée dans : {static_csv_path} ({counts['static']} sites)")
+    print(f"Liste des sites dynamiques sauvegardée dans : {dynamic_csv_path} ({counts['dynamic']} sites)")
+    if counts['error']:
+        print(f"Liste des URLs en erreur sauvegardée dans : {error_csv_path} ({counts['error']} erreurs)")
+    else:
+        print("Aucune erreur rencontrée lors du traitement des URLs.")
 
 
 if __name__ == '__main__':
@@ -229,6 +433,12 @@ if __name__ == '__main__':
     fichier_dynamiques = 'sites_dynamiques_resultat.csv'
     fichier_erreurs = 'urls_en_erreur_resultat.csv'
 
+    arg_parser = argparse.ArgumentParser(description="Classification de sites web en statiques ou dynamiques.")
+    arg_parser.add_argument('--no-host-cache', action='store_true',
+                            help="Inspecter chaque URL même si son domaine a déjà été classifié (audit).")
+    args = arg_parser.parse_args()
+
     print("Début du script de classification des sites web.")
-    main_process(fichier_entree, fichier_statiques, fichier_dynamiques, fichier_erreurs)
+    asyncio.run(main_process(fichier_entree, fichier_statiques, fichier_dynamiques, fichier_erreurs,
+                             use_host_cache=not args.no_host_cache))
     print("\nScript terminé.")
\ No newline at end of file
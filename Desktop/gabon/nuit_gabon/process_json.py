@@ -1,57 +1,52 @@
 import os
-import json
+import re
+import sys
+import orjson
 
 # Define the output file name
 output_file_name = "processed_gabon_data.json"
 
+# Input files: 'gabonX.json' where X is between 1 and 40
+GABON_FILENAME_RE = re.compile(r'^gabon([1-9]|[1-3]\d|40)\.json$')
+
 # Get the current working directory
 current_directory = os.getcwd()
 
-# List to store all raw data from JSON files
-all_raw_data = []
-
-# Iterate over files in the current directory
-for filename in os.listdir(current_directory):
-    # Check if the filename matches the pattern 'gabonX.json' where X is between 1 and 40
-    if filename.startswith("gabon") and filename.endswith(".json"):
-        try:
-            # Extract the number from the filename
-            number_str = filename[len("gabon"):-len(".json")]
-            file_number = int(number_str)
-            if 1 <= file_number <= 40:
-                filepath = os.path.join(current_directory, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        # If the JSON file contains a list of objects, extend the all_raw_data list
-                        if isinstance(data, list):
-                            all_raw_data.extend(data)
-                        # If the JSON file contains a single object, append it to the list
-                        elif isinstance(data, dict):
-                            all_raw_data.append(data)
-                except json.JSONDecodeError as e:
-                    print(f"Error decoding JSON from {filename}: {e}")
-                except Exception as e:
-                    print(f"Error reading {filename}: {e}")
-        except ValueError:
-            # Ignore files that start with 'gabon' but don't have a valid number
-            pass
+# Placeholder values treated as missing
+_EMPTY = frozenset(("", "null"))
+_EMPTY_HOURS = frozenset(("", "Horaires non disponibles", "null"))
+
+# Output field <- input field, for fields that take the first non-empty value
+FIELD_SPEC = (
+    ("image_url", "Image"),
+    ("category", "textsm"),
+    ("city", "textsm2"),
+    ("email", "Text"),
+    ("address", "Field3"),
+    ("ratings", "Field14"),
+)
+# Input fields holding description candidates, in priority order
+DESCRIPTION_FIELDS = ("Field11", "Field3", "textsm3")
 
 # Dictionary to store consolidated data by name
 consolidated_data = {}
 
-for item in all_raw_data:
+def consolidate_item(item):
+    """Merge one raw record into consolidated_data (keyed by Title)."""
     title = item.get("Title")
 
     # Skip if title is missing
     if not title:
-        continue
+        return
+    # Titles repeat across files: interning makes every consolidated_data lookup
+    # for a known title hit the identity fast path instead of a full string compare
+    title = sys.intern(title)
 
     # Initialize new item in consolidated_data if not already present
     if title not in consolidated_data:
         consolidated_data[title] = {
             "name": title,
-            "opening_hours": [],
+            "opening_hours": {},  # dict used as an ordered set (O(1) membership)
             "status": item.get("px2", "Unknown")  # Add status field
         }
 
@@ -61,17 +56,11 @@ for item in all_raw_data:
     if item.get("px2") == "Ouvert" or not new_item.get("status") or new_item["status"] == "Unknown":
         new_item["status"] = item.get("px2", "Unknown")
 
-    # Image URL (take first non-empty, non-null value)
-    if item.get("Image") and item["Image"].strip() not in ["null", ""] and not new_item.get("image_url"):
-        new_item["image_url"] = item["Image"]
-
-    # Category (take first non-empty, non-null value)
-    if item.get("textsm") and item["textsm"].strip() not in ["null", ""] and not new_item.get("category"):
-        new_item["category"] = item["textsm"]
-
-    # City (take first non-empty, non-null value)
-    if item.get("textsm2") and item["textsm2"].strip() not in ["null", ""] and not new_item.get("city"):
-        new_item["city"] = item["textsm2"]
+    # Simple fields (take first non-empty, non-null value, stripped)
+    for out_key, in_key in FIELD_SPEC:
+        v = item.get(in_key)
+        if v and (s := v.strip()) not in _EMPTY:
+            new_item.setdefault(out_key, s)
 
     # Phone Number (prioritize Field2_text, remove "tel:" prefix if present)
     phone_number = ""
@@ -79,43 +68,43 @@ for item in all_raw_data:
         phone_number = item["Field2_text"].replace("tel:", "").strip()
     elif item.get("Field8_text"): # Fallback to Field8_text if Field2_text is not available
         phone_number = item["Field8_text"].replace("tel:", "").strip()
-    if phone_number and phone_number not in ["null", ""] and not new_item.get("phone_number"):
-        new_item["phone_number"] = phone_number
-
-    # Email (from Text field, take first non-empty, non-null value)
-    if item.get("Text") and item["Text"].strip() not in ["null", ""] and not new_item.get("email"):
-        new_item["email"] = item["Text"].strip()
-
-    # Description (prioritize Field11, then Field3, then textsm3)
-    description_candidates = []
-    if item.get("Field11") and item["Field11"].strip() not in ["null", ""]:
-        description_candidates.append(item["Field11"].strip())
-    if item.get("Field3") and item["Field3"].strip() not in ["null", ""]:
-        description_candidates.append(item["Field3"].strip())
-    if item.get("textsm3") and item["textsm3"].strip() not in ["null", ""]:
-        description_candidates.append(item["textsm3"].strip())
-
-    if description_candidates and not new_item.get("description"):
-        # Find the longest description among the candidates
-        longest_description = ""
-        for desc in description_candidates:
-            if len(desc) > len(longest_description):
-                longest_description = desc
-        new_item["description"] = longest_description
-
-    # Address (from Field3, take first non-empty, non-null value)
-    if item.get("Field3") and item["Field3"].strip() not in ["null", ""] and not new_item.get("address"):
-        new_item["address"] = item["Field3"].strip()
-
-    # Ratings (from Field14, take first non-empty, non-null value)
-    if item.get("Field14") and item["Field14"].strip() not in ["null", ""] and not new_item.get("ratings"):
-        new_item["ratings"] = item["Field14"].strip()
+    if phone_number and phone_number not in _EMPTY:
+        new_item.setdefault("phone_number", phone_number)
+
+    # Description (longest of Field11, Field3 and textsm3; first one wins on ties)
+    if "description" not in new_item:
+        description_candidates = [
+            s for v in map(item.get, DESCRIPTION_FIELDS) if v and (s := v.strip()) not in _EMPTY
+        ]
+        if description_candidates:
+            new_item["description"] = max(description_candidates, key=len)
 
     # Opening Hours (from Field15)
-    if item.get("Field15") and item["Field15"].strip() not in ["", "Horaires non disponibles", "null"]:
-        opening_hours = item["Field15"].replace('\n', ' ').strip()
-        if opening_hours not in new_item["opening_hours"]:
-            new_item["opening_hours"].append(opening_hours)
+    v = item.get("Field15")
+    if v and v.strip() not in _EMPTY_HOURS:
+        opening_hours = v.replace('\n', ' ').strip()
+        new_item["opening_hours"][opening_hours] = None
+
+# Iterate over files in the current directory, consolidating each file's records
+# as soon as it is read so that only one file is held in memory at a time
+with os.scandir(current_directory) as entries:
+    for entry in entries:
+        # Only keep files matching 'gabonX.json' where X is between 1 and 40
+        if not GABON_FILENAME_RE.match(entry.name) or not entry.is_file():
+            continue
+        try:
+            with open(entry.path, 'rb') as f:
+                data = orjson.loads(f.read())
+            # If the JSON file contains a single object, treat it as a list of one
+            if isinstance(data, dict):
+                data = [data]
+            if isinstance(data, list):
+                for item in data:
+                    consolidate_item(item)
+        except orjson.JSONDecodeError as e:
+            print(f"Error decoding JSON from {entry.name}: {e}")
+        except Exception as e:
+            print(f"Error reading {entry.name}: {e}")
 
 # Convert consolidated_data to list and clean up opening_hours
 processed_data = []
@@ -131,8 +120,8 @@ for item in consolidated_data.values():
 
 # Save the processed data to a new JSON file in the CWD
 try:
-    with open(output_file_name, 'w', encoding='utf-8') as f:
-        json.dump(processed_data, f, indent=4, ensure_ascii=False)
+    with open(output_file_name, 'wb') as f:
+        f.write(orjson.dumps(processed_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     print(f"Processed data saved to {output_file_name} in the current working directory.")
 except Exception as e:
     print(f"Error saving processed data to {output_file_name}: {e}")
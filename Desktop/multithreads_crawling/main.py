@@ -1,45 +1,83 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel, Field
 import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
 import os
-import json
+import orjson
 import re
 from urllib.parse import urljoin, urlparse
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 import csv
 import io
-from concurrent.futures import ThreadPoolExecutor
 import uvicorn
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # The Markdown cleaning pool's worker processes must not outlive the server
+    _CLEAN_POOL.shutdown(cancel_futures=True)
+
+app = FastAPI(lifespan=lifespan)
 
 # Define the exclusion keywords for filenames (case-insensitive check will be used)
 EXCLUDE_KEYWORDS = ['pdf', 'jpeg', 'jpg', 'png', 'webp']
+# Matches an excluded keyword as a whole '_'/'.'/'-' separated token of a sanitized filename
+_EXCLUDE_RE = re.compile(r'(?:^|[._-])(?:' + '|'.join(map(re.escape, EXCLUDE_KEYWORDS)) + r')(?:$|[._-])', re.IGNORECASE)
 
 class CrawlCSVRequest(BaseModel):
     """Request model for crawling URLs from a CSV."""
     output_dir: str = "./crawl_output_csv"
     max_concurrency_per_site: int = Field(default=8, ge=1, description="Maximum concurrent requests *per site being crawled*.")
     max_depth: int = Field(default=2, ge=0, description="Maximum depth to crawl from each starting URL in the CSV.")
+    max_concurrent_sites: int = Field(default=4, ge=1, description="Maximum number of sites crawled at the same time.")
+
+# Regexes used by clean_markdown, compiled once at import
+_RE_IMG = re.compile(r'!\[([^\]]*)\]\((http[s]?://[^\)]+)\)')
+_RE_LINK = re.compile(r'\[([^\]]+)\]\((http[s]?://[^\)]+)\)')
+_RE_BARE_URL = re.compile(r'(?<!\]\()https?://\S+')
+_RE_FOOTREF = re.compile(r'\[\^?\d+\]')
+_RE_FOOTDEF = re.compile(r'^\[\^?\d+\]:\s?.*$', re.MULTILINE)
+_RE_BLOCKQUOTE = re.compile(r'^\s{0,3}>\s?', re.MULTILINE)
+_RE_BOLD = re.compile(r'(\*\*|__)(.*?)\1')
+_RE_ITAL = re.compile(r'(\*|_)(.*?)\1')
+_RE_EMPTY_HDR = re.compile(r'^\s*#+\s*$', re.MULTILINE)
+_RE_BLANKLINES = re.compile(r'\n\s*\n+')
+# Same result as collapsing every [ \t]+ run to ' ', but single spaces (one per word) are not matched
+_RE_WS = re.compile(r'[ \t]{2,}|\t')
+
+# Used by sanitize_filename / sanitize_dirname: unsafe characters and '.'/'-' separators become '_',
+# then runs of '_' and whitespace collapse to a single '_'
+_FNAME_TRANS = str.maketrans({c: '_' for c in '<>:"/\\|?*.-'})
+_RE_UNDERSCORE_RUNS = re.compile(r'[\s_]+')
 
 def clean_markdown(md_text: str) -> str:
     """
     Cleans Markdown content by removing or modifying specific elements.
+    Each regex pass is skipped when a cheap substring test shows it cannot match.
     """
-    md_text = re.sub(r'!\[([^\]]*)\]\((http[s]?://[^\)]+)\)', '', md_text)
-    md_text = re.sub(r'\[([^\]]+)\]\((http[s]?://[^\)]+)\)', r'\1', md_text)
-    md_text = re.sub(r'(?<!\]\()https?://\S+', '', md_text)
-    md_text = re.sub(r'\[\^?\d+\]', '', md_text)
-    md_text = re.sub(r'^\[\^?\d+\]:\s?.*$', '', md_text, flags=re.MULTILINE)
-    md_text = re.sub(r'^\s{0,3}>\s?', '', md_text, flags=re.MULTILINE)
-    md_text = re.sub(r'(\*\*|__)(.*?)\1', r'\2', md_text)
-    md_text = re.sub(r'(\*|_)(.*?)\1', r'\2', md_text)
-    md_text = re.sub(r'^\s*#+\s*$', '', md_text, flags=re.MULTILINE)
-    md_text = re.sub(r'\(\)', '', md_text)
-    md_text = re.sub(r'\n\s*\n+', '\n\n', md_text)
-    md_text = re.sub(r'[ \t]+', ' ', md_text)
+    if '](' in md_text:
+        md_text = _RE_IMG.sub('', md_text)
+        md_text = _RE_LINK.sub(r'\1', md_text)
+    if '://' in md_text:
+        md_text = _RE_BARE_URL.sub('', md_text)
+    if '[' in md_text:
+        md_text = _RE_FOOTREF.sub('', md_text)
+        md_text = _RE_FOOTDEF.sub('', md_text)
+    if '>' in md_text:
+        md_text = _RE_BLOCKQUOTE.sub('', md_text)
+    if '**' in md_text or '__' in md_text:
+        md_text = _RE_BOLD.sub(r'\2', md_text)
+    if '*' in md_text or '_' in md_text:
+        md_text = _RE_ITAL.sub(r'\2', md_text)
+    if '#' in md_text:
+        md_text = _RE_EMPTY_HDR.sub('', md_text)
+    md_text = md_text.replace('()', '')
+    if '\n' in md_text:
+        md_text = _RE_BLANKLINES.sub('\n\n', md_text)
+    md_text = _RE_WS.sub(' ', md_text)
     return md_text.strip()
 
 def read_urls_from_csv(csv_content: str) -> List[str]:
@@ -81,10 +119,7 @@ def sanitize_filename(url: str) -> str:
         else:
             filename = f"{netloc}_{path}"
 
-        filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
-        filename = re.sub(r'[\s\._-]+', '_', filename)
-        filename = re.sub(r'^_+', '', filename)
-        filename = re.sub(r'_+$', '', filename)
+        filename = _RE_UNDERSCORE_RUNS.sub('_', filename.translate(_FNAME_TRANS)).strip('_')
 
         if not filename:
             filename = f"url_{abs(hash(url))}"
@@ -101,10 +136,7 @@ def sanitize_dirname(url: str) -> str:
     try:
         parsed = urlparse(url)
         dirname = parsed.netloc.replace(".", "_")
-        dirname = re.sub(r'[<>:"/\\|?*]', '_', dirname)
-        dirname = re.sub(r'[\s\._-]+', '_', dirname)
-        dirname = re.sub(r'^_+', '', dirname)
-        dirname = re.sub(r'_+$', '', dirname)
+        dirname = _RE_UNDERSCORE_RUNS.sub('_', dirname.translate(_FNAME_TRANS)).strip('_')
 
         if not dirname:
             dirname = f"domain_{abs(hash(url))}"
@@ -114,24 +146,66 @@ def sanitize_dirname(url: str) -> str:
         print(f"Error sanitizing URL directory name for {url}: {e}")
         return f"domain_error_{abs(hash(url))}"
 
+# Links urljoin would rewrite (dot segments, params, empty query/fragment, stripped control characters)
+_RE_LINK_NEEDS_URLJOIN = re.compile(r'/\.|;|\?#|[?#]$|[\t\r\n]')
+
+def resolve_link(href: str, current_url: str, page_origin: str, allowed_prefixes: Tuple[str, ...]) -> str:
+    """
+    Same result as urljoin(current_url, href), without calling urljoin for
+    same-domain absolute links and plain root-relative links.
+    """
+    if not _RE_LINK_NEEDS_URLJOIN.search(href):
+        if href.startswith(allowed_prefixes):
+            return href
+        if href.startswith('/') and not href.startswith('//'):
+            return page_origin + href
+    return urljoin(current_url, href)
+
 CrawlQueueItem = Tuple[str, int, str, str]
 
-def process_markdown_and_save(url: str, markdown_content: str, output_path: str) -> Dict[str, Any]:
-    """Process Markdown content and save it to a file (executed in a thread)."""
-    try:
-        cleaned_markdown = clean_markdown(markdown_content)
-        if not os.access(os.path.dirname(output_path), os.W_OK):
-            raise OSError(f"No write permission for directory: {os.path.dirname(output_path)}")
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(f"# {url}\n\n{cleaned_markdown}\n")
-        if os.path.exists(output_path):
+# States of a URL in a site crawl's `seen` dict. Links are stored without their #fragment,
+# so anchors into the same page share one entry and the page is fetched once
+URL_QUEUED = 0
+URL_CRAWLED = 1
+
+# Number of finished pages the writer flushes to disk in one thread hop
+WRITE_BATCH_SIZE = 64
+
+WriteQueueItem = Tuple[str, str, bytes]
+
+# Pages whose raw Markdown exceeds this many characters are cleaned in a separate process,
+# so the regex passes on them do not hold the GIL and stall the event loop; smaller pages are cleaned inline
+LARGE_PAGE_CHARS = 200_000
+_CLEAN_POOL = ProcessPoolExecutor(max_workers=2)
+
+def render_markdown(url: str, markdown_content: str) -> bytes:
+    """Clean Markdown content and encode the file body to be saved for a URL."""
+    cleaned_markdown = clean_markdown(markdown_content)
+    return f"# {url}\n\n{cleaned_markdown}\n".encode("utf-8")
+
+def write_markdown_batch(batch: List[WriteQueueItem], dir_fd: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Write a batch of rendered pages to disk (executed in a thread).
+    One open/write/close per file, without fsync: losing the last pages of a crawl on a crash is acceptable.
+    With dir_fd (the site directory, opened once), files are opened by name relative to it.
+    """
+    outcomes = []
+    for url, output_path, data in batch:
+        try:
+            path = output_path if dir_fd is None else os.path.basename(output_path)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
             print(f"Saved cleaned Markdown to: {output_path}")
-            return {"status": "success", "url": url}
-        else:
-            raise IOError(f"File was not created: {output_path}")
-    except Exception as e:
-        print(f"Error processing/saving {url}: {e}")
-        return {"status": "failed", "url": url, "error": str(e)}
+            outcomes.append({"status": "success", "url": url})
+        except Exception as e:
+            print(f"Error processing/saving {url}: {e}")
+            outcomes.append({"status": "failed", "url": url, "error": str(e)})
+    return outcomes
 
 async def crawl_website_single_site(
     start_url: str,
@@ -143,9 +217,11 @@ async def crawl_website_single_site(
     Crawl a single website deeply and save each page as a cleaned Markdown file
     in a site-specific subdirectory, with parallelization.
     """
-    crawled_urls = set()
-    queued_urls = set()
-    crawl_queue: asyncio.Queue[CrawlQueueItem] = asyncio.Queue()
+    # One dict for both states of a URL: a single hash probe per link instead of one per set
+    seen: Dict[str, int] = {}
+    crawled_count = 0
+    crawl_queue: asyncio.Queue[Optional[CrawlQueueItem]] = asyncio.Queue()
+    write_queue: asyncio.Queue[WriteQueueItem] = asyncio.Queue()
     semaphore = asyncio.Semaphore(max_concurrency)
     results = {"success": [], "failed": [], "skipped_by_filter": [], "initial_url": start_url}
 
@@ -165,8 +241,7 @@ async def crawl_website_single_site(
 
         try:
             os.makedirs(site_output_path, exist_ok=True)
-            if not os.path.exists(site_output_path):
-                raise OSError(f"Failed to create directory: {site_output_path}")
+            site_dir_fd = os.open(site_output_path, os.O_RDONLY | os.O_DIRECTORY) if os.open in os.supports_dir_fd else None
         except Exception as e:
             results["failed"].append({"url": start_url, "error": f"Cannot create output directory: {e}"})
             print(f"Error creating output directory {site_output_path}: {e}")
@@ -177,8 +252,11 @@ async def crawl_website_single_site(
         print(f"Error processing start URL {start_url} or determining output path: {e}")
         return results
 
+    # Same-domain links almost always start with one of these; urlparse is only the fallback
+    allowed_prefixes = (f"https://{start_domain}/", f"http://{start_domain}/")
+
     crawl_queue.put_nowait((start_url, 0, start_domain, site_output_path))
-    queued_urls.add(start_url)
+    seen[start_url] = URL_QUEUED
 
     print(f"Starting crawl for: {start_url} with max_depth={max_depth}, max_concurrency={max_concurrency}")
 
@@ -196,113 +274,139 @@ async def crawl_website_single_site(
         exclude_social_media_links=True,
     )
 
-    # ThreadPoolExecutor pour le post-traitement
-    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
-        async def crawl_page():
-            """Worker function to process URLs from the queue."""
-            while not crawl_queue.empty():
-                try:
-                    current_url, current_depth, crawl_start_domain, current_site_output_path = await crawl_queue.get()
+    async def crawl_page():
+        """Worker function to process URLs from the queue."""
+        nonlocal crawled_count
+        while True:
+            item = await crawl_queue.get()
+            if item is None:
+                crawl_queue.task_done()
+                break
+            try:
+                current_url, current_depth, crawl_start_domain, current_site_output_path = item
 
-                    if current_url in crawled_urls:
-                        crawl_queue.task_done()
-                        continue
+                if seen.get(current_url) == URL_CRAWLED:
+                    crawl_queue.task_done()
+                    continue
 
-                    try:
-                        current_domain = urlparse(current_url).netloc
-                        if current_domain != crawl_start_domain:
-                            print(f"Skipping external URL: {current_url} (Domain: {current_domain}, Expected: {crawl_start_domain})")
-                            crawled_urls.add(current_url)
-                            crawl_queue.task_done()
-                            continue
-                    except Exception as e:
-                        print(f"Error parsing domain for URL {current_url}: {e}. Skipping.")
-                        crawled_urls.add(current_url)
+                try:
+                    current_domain = urlparse(current_url).netloc
+                    if current_domain != crawl_start_domain:
+                        print(f"Skipping external URL: {current_url} (Domain: {current_domain}, Expected: {crawl_start_domain})")
+                        seen[current_url] = URL_CRAWLED
                         crawl_queue.task_done()
                         continue
+                except Exception as e:
+                    print(f"Error parsing domain for URL {current_url}: {e}. Skipping.")
+                    seen[current_url] = URL_CRAWLED
+                    crawl_queue.task_done()
+                    continue
 
-                    crawled_urls.add(current_url)
-                    print(f"Crawling ({len(crawled_urls)}): {current_url} (Depth: {current_depth})")
+                seen[current_url] = URL_CRAWLED
+                crawled_count += 1
+                print(f"Crawling ({crawled_count}): {current_url} (Depth: {current_depth})")
 
-                    filename = sanitize_filename(current_url)
-                    output_path = os.path.join(current_site_output_path, filename)
+                page_origin = f"{current_url.partition('://')[0]}://{crawl_start_domain}"
+                filename = sanitize_filename(current_url)
+                output_path = os.path.join(current_site_output_path, filename)
 
-                    if any(keyword in filename.lower() for keyword in EXCLUDE_KEYWORDS):
-                        print(f"Skipping save for {current_url} due to filename filter: {filename}")
-                        results["skipped_by_filter"].append(current_url)
-                        if current_depth < max_depth:
-                            async with semaphore:
-                                async with AsyncWebCrawler(verbose=False) as crawler:
-                                    result = await crawler.arun(url=current_url, config=config)
-                                    if result.success:
-                                        internal_links = result.links.get("internal", [])
-                                        for link in internal_links:
-                                            href = link["href"]
-                                            try:
-                                                absolute_url = urljoin(current_url, href)
-                                                parsed_absolute_url = urlparse(absolute_url)
-                                                if parsed_absolute_url.netloc == crawl_start_domain:
-                                                    if absolute_url not in crawled_urls and absolute_url not in queued_urls:
-                                                        crawl_queue.put_nowait((absolute_url, current_depth + 1, crawl_start_domain, current_site_output_path))
-                                                        queued_urls.add(absolute_url)
-                                            except Exception as link_e:
-                                                print(f"Error processing link {href} from {current_url}: {link_e}")
-                                    else:
-                                        print(f"Failed to get links from {current_url} (skipped save): {result.error_message}")
-                        crawl_queue.task_done()
-                        continue
-
-                    async with semaphore:
-                        async with AsyncWebCrawler(verbose=False) as crawler:
+                if _EXCLUDE_RE.search(filename):
+                    print(f"Skipping save for {current_url} due to filename filter: {filename}")
+                    results["skipped_by_filter"].append(current_url)
+                    if current_depth < max_depth:
+                        async with semaphore:
                             result = await crawler.arun(url=current_url, config=config)
-
-                        if result.success:
-                            # Déléguer le traitement du Markdown et l'écriture à un thread
-                            future = executor.submit(
-                                process_markdown_and_save,
-                                current_url,
-                                result.markdown.raw_markdown,
-                                output_path
-                            )
-                            process_result = future.result()  # Bloque jusqu'à ce que le thread termine
-                            if process_result["status"] == "success":
-                                results["success"].append(current_url)
-                            else:
-                                results["failed"].append({"url": current_url, "error": process_result["error"]})
-
-                            if current_depth < max_depth:
+                            if result.success:
                                 internal_links = result.links.get("internal", [])
                                 for link in internal_links:
                                     href = link["href"]
                                     try:
-                                        absolute_url = urljoin(current_url, href)
-                                        parsed_absolute_url = urlparse(absolute_url)
-                                        if parsed_absolute_url.netloc == crawl_start_domain:
-                                            if absolute_url not in crawled_urls and absolute_url not in queued_urls:
+                                        absolute_url = resolve_link(href, current_url, page_origin, allowed_prefixes).partition('#')[0]
+                                        if absolute_url.startswith(allowed_prefixes) or urlparse(absolute_url).netloc == crawl_start_domain:
+                                            if absolute_url not in seen:
                                                 crawl_queue.put_nowait((absolute_url, current_depth + 1, crawl_start_domain, current_site_output_path))
-                                                queued_urls.add(absolute_url)
+                                                seen[absolute_url] = URL_QUEUED
                                     except Exception as link_e:
                                         print(f"Error processing link {href} from {current_url}: {link_e}")
-                        else:
-                            print(f"Failed to crawl {current_url}: {result.error_message}")
-                            results["failed"].append({"url": current_url, "error": result.error_message})
-
-                    crawl_queue.task_done()
-                except Exception as e:
-                    print(f"Error in crawl_page worker: {e}")
+                            else:
+                                print(f"Failed to get links from {current_url} (skipped save): {result.error_message}")
                     crawl_queue.task_done()
+                    continue
 
-        worker_tasks = []
-        for _ in range(max_concurrency):
-            task = asyncio.create_task(crawl_page())
-            worker_tasks.append(task)
+                async with semaphore:
+                    result = await crawler.arun(url=current_url, config=config)
 
-        await crawl_queue.join()
-
-        for task in worker_tasks:
-            task.cancel()
+                    if result.success:
+                        # Nettoyer le Markdown (dans un processus à part pour les très grosses pages), puis confier l'écriture au writer
+                        try:
+                            raw_markdown = result.markdown.raw_markdown
+                            if len(raw_markdown) > LARGE_PAGE_CHARS:
+                                data = await asyncio.get_running_loop().run_in_executor(_CLEAN_POOL, render_markdown, current_url, raw_markdown)
+                            else:
+                                data = render_markdown(current_url, raw_markdown)
+                            write_queue.put_nowait((current_url, output_path, data))
+                        except Exception as e:
+                            print(f"Error processing/saving {current_url}: {e}")
+                            results["failed"].append({"url": current_url, "error": str(e)})
 
-        await asyncio.gather(*worker_tasks, return_exceptions=True)
+                        if current_depth < max_depth:
+                            internal_links = result.links.get("internal", [])
+                            for link in internal_links:
+                                href = link["href"]
+                                try:
+                                    absolute_url = resolve_link(href, current_url, page_origin, allowed_prefixes).partition('#')[0]
+                                    if absolute_url.startswith(allowed_prefixes) or urlparse(absolute_url).netloc == crawl_start_domain:
+                                        if absolute_url not in seen:
+                                            crawl_queue.put_nowait((absolute_url, current_depth + 1, crawl_start_domain, current_site_output_path))
+                                            seen[absolute_url] = URL_QUEUED
+                                except Exception as link_e:
+                                    print(f"Error processing link {href} from {current_url}: {link_e}")
+                    else:
+                        print(f"Failed to crawl {current_url}: {result.error_message}")
+                        results["failed"].append({"url": current_url, "error": result.error_message})
+
+                crawl_queue.task_done()
+            except Exception as e:
+                print(f"Error in crawl_page worker: {e}")
+                crawl_queue.task_done()
+
+    async def write_pages():
+        """Writer coroutine: drains up to WRITE_BATCH_SIZE pages and saves them in one thread hop."""
+        while True:
+            batch = [await write_queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE and not write_queue.empty():
+                batch.append(write_queue.get_nowait())
+            try:
+                outcomes = await asyncio.to_thread(write_markdown_batch, batch, site_dir_fd)
+                for outcome in outcomes:
+                    if outcome["status"] == "success":
+                        results["success"].append(outcome["url"])
+                    else:
+                        results["failed"].append({"url": outcome["url"], "error": outcome["error"]})
+            finally:
+                for _ in batch:
+                    write_queue.task_done()
+
+    # One crawler (browser) shared by every worker of this site instead of one per page
+    try:
+        async with AsyncWebCrawler(verbose=False) as crawler:
+            writer_task = asyncio.create_task(write_pages())
+            worker_tasks = []
+            for _ in range(max_concurrency):
+                task = asyncio.create_task(crawl_page())
+                worker_tasks.append(task)
+
+            await crawl_queue.join()
+            # Workers wait on get() until the crawl is over; one None per worker tells it to exit
+            for _ in worker_tasks:
+                crawl_queue.put_nowait(None)
+            await write_queue.join()
+            writer_task.cancel()
+
+            await asyncio.gather(*worker_tasks, writer_task, return_exceptions=True)
+    finally:
+        if site_dir_fd is not None:
+            os.close(site_dir_fd)
 
     print(f"Finished crawl for: {start_url}")
     return results
@@ -312,7 +416,8 @@ async def crawl_csv_upload_endpoint(
     csv_file: UploadFile = File(...),
     output_dir: str = Form("./crawl_output_csv"),
     max_concurrency_per_site: int = Form(default=50, ge=1),
-    max_depth: int = Form(default=2, ge=0)
+    max_depth: int = Form(default=2, ge=0),
+    max_concurrent_sites: int = Form(default=4, ge=1)
 ):
     """
     FastAPI endpoint to crawl URLs provided in an uploaded CSV file.
@@ -337,31 +442,32 @@ async def crawl_csv_upload_endpoint(
             "site_crawl_results": {}
         }
 
-        for i, url in enumerate(urls_to_crawl):
-            print(f"\n--- Processing site {i+1}/{len(urls_to_crawl)}: {url} ---")
-            try:
-                site_results = await crawl_website_single_site(
-                    start_url=url,
-                    output_dir=output_dir,
-                    max_concurrency=max_concurrency_per_site,
-                    max_depth=max_depth
-                )
-                overall_results["site_crawl_results"][url] = site_results
-            except Exception as e:
-                print(f"An unexpected error occurred during the crawl of {url}: {e}")
-                overall_results["site_crawl_results"][url] = {"status": "error", "message": f"Unexpected error during site processing: {str(e)}"}
+        # Sites share nothing, so up to max_concurrent_sites of them are crawled at once
+        site_semaphore = asyncio.Semaphore(max_concurrent_sites)
+
+        async def run_site(i: int, url: str) -> Dict[str, Any]:
+            async with site_semaphore:
+                print(f"\n--- Processing site {i+1}/{len(urls_to_crawl)}: {url} ---")
+                try:
+                    return await crawl_website_single_site(
+                        start_url=url,
+                        output_dir=output_dir,
+                        max_concurrency=max_concurrency_per_site,
+                        max_depth=max_depth
+                    )
+                except Exception as e:
+                    print(f"An unexpected error occurred during the crawl of {url}: {e}")
+                    return {"status": "error", "message": f"Unexpected error during site processing: {str(e)}"}
+
+        site_results_list = await asyncio.gather(*(run_site(i, url) for i, url in enumerate(urls_to_crawl)))
+        for url, site_results in zip(urls_to_crawl, site_results_list):
+            overall_results["site_crawl_results"][url] = site_results
 
         metadata_path = os.path.join(output_dir, "overall_metadata.json")
         try:
-            serializable_results = overall_results.copy()
-            for url, res in serializable_results["site_crawl_results"].items():
-                if "success" in res and isinstance(res["success"], set):
-                    res["success"] = list(res["success"])
-                if "skipped_by_filter" in res and isinstance(res["skipped_by_filter"], set):
-                    res["skipped_by_filter"] = list(res["skipped_by_filter"])
-
-            with open(metadata_path, "w", encoding="utf-8") as f:
-                json.dump(serializable_results, f, indent=2)
+            # default=list covers any set left in the results, which orjson does not serialize natively
+            with open(metadata_path, "wb") as f:
+                f.write(orjson.dumps(overall_results, default=list, option=orjson.OPT_INDENT_2))
             overall_results["metadata_path"] = metadata_path
             print(f"\nOverall metadata saved to {metadata_path}")
         except Exception as e:
@@ -1,9 +1,11 @@
 import os
 import re
+import asyncio
 import uuid
 import markdown
-import time
-from qdrant_client import QdrantClient
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http.models import PointStruct, VectorParams, Distance
 from transformers import AutoTokenizer, AutoModel
 import torch
@@ -16,16 +18,33 @@ QDRANT_HOST = "192.168.0.58"
 QDRANT_PORT = 11434
 COLLECTION_NAME = "abbaye-arthous-landes"
 BATCH_SIZE = 100
+UPSERT_BATCH_SIZE = 500
 EMBEDDING_MODEL = "nomic-embed-text-v1"
 GROUP_BY = "url_prefix"
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+# Embed on the GPU in half precision when one is available
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+MODEL_DTYPE = torch.float16 if DEVICE.type == "cuda" else torch.float32
+# Max padded tokens (longest sequence x batch size) per forward pass
+EMBEDDING_TOKEN_BUDGET = 16384
+READ_WORKERS = 16
+
+# One Markdown converter per reader thread, reused (reset) for every file, and the tag-stripping regex compiled once
+_MD_LOCAL = threading.local()
+_TAG_RE = re.compile(r'<[^>]+>')
+
+def get_markdown_converter() -> markdown.Markdown:
+    md = getattr(_MD_LOCAL, "md", None)
+    if md is None:
+        md = _MD_LOCAL.md = markdown.Markdown()
+    return md
 
 def read_markdown_file(file_path: str) -> Tuple[str, Dict]:
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
-    html = markdown.markdown(content)
-    text = re.sub(r'<[^>]+>', '', html)
+    html = get_markdown_converter().reset().convert(content)
+    text = _TAG_RE.sub('', html)
     metadata = {
         "url": file_path.replace(MARKDOWN_DIR, "https://website.com").replace(".md", ""),
         "title": Path(file_path).stem.replace("-", " ").title(),
@@ -42,40 +61,59 @@ def get_group_key(metadata: Dict) -> str:
     return "default"
 
 def generate_embeddings(texts: List[str], model, tokenizer) -> List[List[float]]:
-    encoded_input = tokenizer(texts, padding=True, truncation=True, return_tensors='pt')
-    with torch.no_grad():
-        model_output = model(**encoded_input)
-    embeddings = model_output.last_hidden_state.mean(dim=1)
-    return embeddings.numpy().tolist()
+    # Tokenize once, then embed in length-sorted sub-batches so little compute goes to padding
+    input_ids = tokenizer(texts, truncation=True)["input_ids"]
+    order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    start = 0
+    while start < len(order):
+        end = start + 1
+        while end < len(order) and (end - start + 1) * len(input_ids[order[end]]) <= EMBEDDING_TOKEN_BUDGET:
+            end += 1
+        batch = order[start:end]
+        encoded_input = tokenizer.pad({"input_ids": [input_ids[i] for i in batch]}, return_tensors='pt')
+        encoded_input = {k: v.to(DEVICE, non_blocking=True) for k, v in encoded_input.items()}
+        with torch.inference_mode():
+            model_output = model(**encoded_input)
+            # Mean over real tokens only: padding positions are masked out of both the sum and the count.
+            # Pooled in float32 so long fp16 sequences cannot overflow the sum
+            hidden = model_output.last_hidden_state.float()
+            mask = encoded_input["attention_mask"].float()
+            counts = mask.sum(dim=1, keepdim=True).clamp(min=1)
+            batch_embeddings = torch.einsum("bsh,bs->bh", hidden, mask) / counts
+        for i, embedding in zip(batch, batch_embeddings.cpu().tolist()):
+            embeddings[i] = embedding
+        start = end
+    return embeddings
 
-def store_in_qdrant(points: List[PointStruct], client: QdrantClient) -> bool:
+async def store_in_qdrant(points: List[PointStruct], client: AsyncQdrantClient) -> bool:
     for attempt in range(MAX_RETRIES):
         try:
-            client.upsert(collection_name=COLLECTION_NAME, points=points)
+            await client.upsert(collection_name=COLLECTION_NAME, points=points)
             return True
         except Exception as e:
             print(f"Attempt {attempt+1} failed to store points: {e}")
             if attempt < MAX_RETRIES - 1:
                 print(f"Retrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
+                await asyncio.sleep(RETRY_DELAY)
             else:
                 print("Max retries reached. Could not store points.")
                 return False
     return False
 
-def connect_to_qdrant() -> Optional[QdrantClient]:
+async def connect_to_qdrant() -> Optional[AsyncQdrantClient]:
     print(f"Attempting to connect to Qdrant at {QDRANT_HOST}:{QDRANT_PORT}")
     for attempt in range(MAX_RETRIES):
         try:
-            client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
-            client.get_collections()
+            client = AsyncQdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+            await client.get_collections()
             print("Successfully connected to Qdrant")
             return client
         except Exception as e:
             print(f"Connection attempt {attempt+1} failed: {e}")
             if attempt < MAX_RETRIES - 1:
                 print(f"Retrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
+                await asyncio.sleep(RETRY_DELAY)
             else:
                 print(f"""
 ---------------------------------------------------------
@@ -90,14 +128,14 @@ Please make sure that:
                 return None
     return None
 
-def create_collection_if_not_exists(client: QdrantClient, model, tokenizer) -> bool:
+async def create_collection_if_not_exists(client: AsyncQdrantClient, model, tokenizer) -> bool:
     try:
-        if not client.collection_exists(COLLECTION_NAME):
+        if not await client.collection_exists(COLLECTION_NAME):
             print(f"Creating collection '{COLLECTION_NAME}'")
             dummy_text = ["This is a test."]
             embedding = generate_embeddings(dummy_text, model, tokenizer)[0]
             vector_size = len(embedding)
-            client.create_collection(
+            await client.create_collection(
                 collection_name=COLLECTION_NAME,
                 vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
             )
@@ -109,23 +147,45 @@ def create_collection_if_not_exists(client: QdrantClient, model, tokenizer) -> b
         print(f"Failed to create collection: {e}")
         return False
 
-def main():
-    client = connect_to_qdrant()
+def build_qdrant_points(points: List[Dict], model, tokenizer) -> List[PointStruct]:
+    texts = [p["text"] for p in points]
+    embeddings = generate_embeddings(texts, model, tokenizer)
+    return [
+        PointStruct(
+            id=p["id"],
+            vector=embedding,
+            payload={
+                **p["metadata"],
+                "text": p["text"][:1000]
+            }
+        )
+        for p, embedding in zip(points, embeddings)
+    ]
+
+async def main():
+    client = await connect_to_qdrant()
     if client is None:
         print("Exiting due to connection failure.")
         return
 
+    try:
+        await run_pipeline(client)
+    finally:
+        await client.close()
+
+async def run_pipeline(client: AsyncQdrantClient):
     try:
         print(f"Loading embedding model '{EMBEDDING_MODEL}'...")
-        tokenizer = AutoTokenizer.from_pretrained("nomic-ai/nomic-embed-text-v1", trust_remote_code=True)
-        model = AutoModel.from_pretrained("nomic-ai/nomic-embed-text-v1", trust_remote_code=True)
+        tokenizer = AutoTokenizer.from_pretrained("nomic-ai/nomic-embed-text-v1", trust_remote_code=True, use_fast=True)
+        model = AutoModel.from_pretrained("nomic-ai/nomic-embed-text-v1", trust_remote_code=True, torch_dtype=MODEL_DTYPE)
+        model.to(DEVICE)
         model.eval()
-        print("Model loaded successfully")
+        print(f"Model loaded successfully on {DEVICE}")
     except Exception as e:
         print(f"Failed to load embedding model: {e}")
         return
 
-    if not create_collection_if_not_exists(client, model, tokenizer):
+    if not await create_collection_if_not_exists(client, model, tokenizer):
         print("Exiting due to collection creation failure.")
         return
 
@@ -140,10 +200,54 @@ def main():
     points = []
     successful_files = 0
     failed_files = 0
+    batch_number = 0
+    # Embedded points waiting to be sent, and the single upsert allowed in flight:
+    # the upsert of one group runs while the next batches are being embedded
+    pending_points: List[PointStruct] = []
+    upsert_task: Optional[asyncio.Task] = None
+    upsert_count = 0
+
+    async def collect_upsert():
+        nonlocal upsert_task, successful_files, failed_files
+        if upsert_task is None:
+            return
+        if await upsert_task:
+            successful_files += upsert_count
+            print(f"Stored {upsert_count} points in Qdrant")
+        else:
+            failed_files += upsert_count
+            print(f"Failed to store {upsert_count} points in Qdrant")
+        upsert_task = None
+
+    async def send_pending():
+        nonlocal pending_points, upsert_task, upsert_count
+        await collect_upsert()
+        print(f"Storing {len(pending_points)} points in Qdrant...")
+        upsert_task = asyncio.create_task(store_in_qdrant(pending_points, client))
+        upsert_count = len(pending_points)
+        pending_points = []
+
+    async def embed_batch():
+        nonlocal points, batch_number
+        batch_number += 1
+        print(f"Processing batch of {len(points)} documents...")
+        print("Generating embeddings...")
+        # Embedding runs in a thread so the in-flight upsert keeps progressing
+        pending_points.extend(await asyncio.to_thread(build_qdrant_points, points, model, tokenizer))
+        print(f"Embedded batch {batch_number}: {len(points)} points")
+        points = []
+        if len(pending_points) >= UPSERT_BATCH_SIZE:
+            await send_pending()
+
+    # Files are read (and converted) ahead by a thread pool; the loop consumes them in order
+    read_pool = ThreadPoolExecutor(max_workers=READ_WORKERS)
+    read_futures = [read_pool.submit(read_markdown_file, str(file_path)) for file_path in md_files]
+    read_pool.shutdown(wait=False)
 
     for i, file_path in enumerate(md_files):
         try:
-            text, metadata = read_markdown_file(str(file_path))
+            text, metadata = await asyncio.wrap_future(read_futures[i])
+            read_futures[i] = None
             if not text:
                 print(f"Skipping empty file: {file_path}")
                 continue
@@ -161,34 +265,8 @@ def main():
             }
             points.append(point)
 
-            if len(points) >= BATCH_SIZE or i == len(md_files) - 1:
-                print(f"Processing batch of {len(points)} documents...")
-                texts = [p["text"] for p in points]
-
-                print("Generating embeddings...")
-                embeddings = generate_embeddings(texts, model, tokenizer)
-
-                qdrant_points = [
-                    PointStruct(
-                        id=p["id"],
-                        vector=embedding,
-                        payload={
-                            **p["metadata"],
-                            "text": p["text"][:1000]
-                        }
-                    )
-                    for p, embedding in zip(points, embeddings)
-                ]
-
-                print(f"Storing {len(qdrant_points)} points in Qdrant...")
-                if store_in_qdrant(qdrant_points, client):
-                    successful_files += len(points)
-                    print(f"Successfully processed batch {i // BATCH_SIZE + 1}: {len(points)} points")
-                else:
-                    failed_files += len(points)
-                    print(f"Failed to process batch {i // BATCH_SIZE + 1}")
-
-                points = []
+            if len(points) >= BATCH_SIZE:
+                await embed_batch()
 
             if (i + 1) % 10 == 0 or i == len(md_files) - 1:
                 progress = (i + 1) / len(md_files) * 100
@@ -198,6 +276,16 @@ def main():
             failed_files += 1
             print(f"Error processing {file_path}: {e}")
 
+    try:
+        if points:
+            await embed_batch()
+        if pending_points:
+            await send_pending()
+    except Exception as e:
+        failed_files += len(points)
+        print(f"Error processing final batch: {e}")
+    await collect_upsert()
+
     print("\n" + "="*50)
     print("Processing complete!")
     print(f"Successfully processed: {successful_files} files")
@@ -206,8 +294,8 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\nProcess interrupted by user. Exiting.")
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+        print(f"An unexpected error occurred: {e}")
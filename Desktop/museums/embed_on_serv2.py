@@ -3,11 +3,19 @@ import re
 import uuid
 import markdown
 import time
-import json
+import functools
+import hashlib
+from array import array
+from collections import OrderedDict, deque
+import orjson
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import aiohttp
 import requests
-from qdrant_client import QdrantClient
+from requests.adapters import HTTPAdapter
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http.models import PointStruct, VectorParams, Distance
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 from pathlib import Path
 
 # Configuration
@@ -16,44 +24,94 @@ OLLAMA_API_BASE = "http://192.168.0.58:11434"  # Ollama API endpoint
 OLLAMA_EMBED_MODEL = "nomic-embed-text:latest"  # Updated to match the available model
 LOCAL_QDRANT_HOST = "localhost"
 LOCAL_QDRANT_PORT = 6333  # Default Qdrant port
+LOCAL_QDRANT_GRPC_PORT = 6334  # Default Qdrant gRPC port, used for uploads
 COLLECTION_NAME = "chateau-azay-le-ferron"
 BATCH_SIZE = 100
 GROUP_BY = "url_prefix"
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+OLLAMA_CONCURRENCY = 8  # Embedding requests in flight at once
+OLLAMA_EMBED_CHUNK = 32  # Texts sent in a single /api/embed request
+QDRANT_UPLOAD_CONCURRENCY = 2  # Upserts in flight at once
+READ_AHEAD = 4 * BATCH_SIZE  # Files submitted for conversion ahead of the one being batched
+EMBEDDING_CACHE_SIZE = 20_000  # Embeddings kept for reuse (about 3 KB each for 768 dimensions)
+# Point ids are derived from the file path, so re-running the ingestion overwrites points instead of duplicating them
+POINT_ID_NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+# One pooled keep-alive session for every Ollama call instead of a new connection per request
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0))
+# Request bodies are encoded and responses decoded with orjson rather than the stdlib json module
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# One Markdown converter per process, reused (reset) for every file, and the tag-stripping regex compiled once
+_MD = markdown.Markdown()
+_TAG_RE = re.compile(r'<[^>]+>')
 
 def read_markdown_file(file_path: str) -> Tuple[str, Dict]:
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
-    html = markdown.markdown(content)
-    text = re.sub(r'<[^>]+>', '', html)
     metadata = {
         "url": file_path.replace(MARKDOWN_DIR, "https://website.com").replace(".md", ""),
         "title": Path(file_path).stem.replace("-", " ").title(),
         "file_path": file_path
     }
+    if not content.strip():
+        return "", metadata
+    html = _MD.reset().convert(content)
+    text = _TAG_RE.sub('', html)
     return text.strip(), metadata
 
-def get_group_key(metadata: Dict) -> str:
-    if GROUP_BY == "url_prefix":
-        url_parts = metadata["url"].split("/")
-        return "/".join(url_parts[3:4]) if len(url_parts) > 3 else "root"
-    elif GROUP_BY == "directory":
-        return str(Path(metadata["file_path"]).parent.relative_to(MARKDOWN_DIR))
+def iter_markdown_files(root: str):
+    """Yield the .md file entries under root as the tree is walked (unreadable directories are skipped, like rglob)"""
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_markdown_files(entry.path)
+        elif entry.name.endswith(".md"):
+            yield entry
+
+def read_markdown_file_or_error(file_path: str):
+    """read_markdown_file for the process pool: the error is returned so one bad file does not stop the map"""
+    try:
+        return read_markdown_file(file_path)
+    except Exception as e:
+        return e
+
+def group_by_url_prefix(metadata: Dict) -> str:
+    url_parts = metadata["url"].split("/", 4)
+    return url_parts[3] if len(url_parts) > 3 else "root"
+
+@functools.lru_cache(maxsize=4096)
+def directory_group_key(parent_dir: str) -> str:
+    return str(Path(parent_dir).relative_to(MARKDOWN_DIR))
+
+def group_by_directory(metadata: Dict) -> str:
+    # Files of one directory share a group, so the Path work is cached per directory
+    return directory_group_key(os.path.dirname(metadata["file_path"]))
+
+def group_by_default(metadata: Dict) -> str:
     return "default"
 
+# GROUP_BY is fixed for the run, so the grouping function is chosen once here
+get_group_key = {"url_prefix": group_by_url_prefix, "directory": group_by_directory}.get(GROUP_BY, group_by_default)
+
 def generate_ollama_embedding(text: str) -> List[float]:
     """Generate embedding for a single text using Ollama API"""
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(
-                f"{OLLAMA_API_BASE}/api/embeddings",
-                json={"model": OLLAMA_EMBED_MODEL, "prompt": text},
+            response = SESSION.post(
+                f"{OLLAMA_API_BASE}/api/embed",
+                data=orjson.dumps({"model": OLLAMA_EMBED_MODEL, "input": text}),
+                headers=JSON_HEADERS,
                 timeout=60  # Allow up to 60 seconds for the embedding to generate
             )
             response.raise_for_status()
-            result = response.json()
-            return result["embedding"]
+            result = orjson.loads(response.content)
+            return result["embeddings"][0]
         except Exception as e:
             print(f"Attempt {attempt+1} failed to get embedding: {e}")
             if attempt < MAX_RETRIES - 1:
@@ -64,55 +122,135 @@ def generate_ollama_embedding(text: str) -> List[float]:
                 raise
     return []
 
-def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings for a batch of texts using Ollama API"""
-    embeddings = []
-    for i, text in enumerate(texts):
-        try:
-            print(f"Generating embedding for text {i+1}/{len(texts)}...")
-            embedding = generate_ollama_embedding(text)
-            embeddings.append(embedding)
-        except Exception as e:
-            print(f"Failed to generate embedding for text {i+1}: {e}")
-            # Use a zero vector as a fallback (same size as successful embeddings)
-            if embeddings:
-                embeddings.append([0.0] * len(embeddings[0]))
-            else:
-                # If we haven't generated any embeddings yet, we can't determine the size
-                raise
-    return embeddings
+async def generate_ollama_embeddings_async(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, texts: List[str]) -> List[List[float]]:
+    """Generate embeddings for a chunk of texts in one /api/embed request, limited by the shared semaphore"""
+    async with semaphore:
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with session.post(
+                    f"{OLLAMA_API_BASE}/api/embed",
+                    data=orjson.dumps({"model": OLLAMA_EMBED_MODEL, "input": texts}),
+                    headers=JSON_HEADERS
+                ) as response:
+                    response.raise_for_status()
+                    result = orjson.loads(await response.read())
+                    return result["embeddings"]
+            except Exception as e:
+                print(f"Attempt {attempt+1} failed to get embeddings: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    print(f"Retrying in {RETRY_DELAY} seconds...")
+                    await asyncio.sleep(RETRY_DELAY)
+                else:
+                    print(f"Max retries reached. Could not get embeddings from Ollama server at {OLLAMA_API_BASE}")
+                    raise
+    return []
+
+async def generate_chunk_embeddings(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, texts: List[str]) -> List[Union[List[float], Exception]]:
+    """Embed a chunk in one request; if it fails, retry its texts one at a time so a bad input only loses its own embedding"""
+    try:
+        return await generate_ollama_embeddings_async(session, semaphore, texts)
+    except Exception as e:
+        if len(texts) == 1:
+            return [e]
+        print(f"Request for {len(texts)} texts failed, retrying them one at a time: {e}")
+    results = await asyncio.gather(
+        *(generate_ollama_embeddings_async(session, semaphore, [text]) for text in texts),
+        return_exceptions=True
+    )
+    return [result if isinstance(result, Exception) else result[0] for result in results]
+
+def create_ollama_session() -> aiohttp.ClientSession:
+    """Keep-alive session shared by every embedding request of the run"""
+    connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=300)  # Allow up to 5 minutes for a chunk of embeddings to generate
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
 
-def store_in_qdrant(points: List[PointStruct], client: QdrantClient) -> bool:
+# Embeddings recently fetched in this run, keyed by a digest of the text, so pages sharing the same
+# boilerplate are only sent to Ollama once; kept as float32 arrays and evicted least recently used first
+EMBEDDING_CACHE: "OrderedDict[bytes, array]" = OrderedDict()
+
+def text_cache_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+async def generate_embeddings_batch(session: aiohttp.ClientSession, texts: List[str]) -> Tuple[List[List[float]], int]:
+    """Generate embeddings for a batch of texts using Ollama API, one /api/embed request per chunk, at most OLLAMA_CONCURRENCY at a time.
+    Returns the embeddings and how many of them are zero-vector fallbacks for texts that could not be embedded."""
+    keys = [text_cache_key(text) for text in texts]
+    # Vectors for this batch, from the cache or fetched below; texts not embedded yet are each sent once
+    # even if they appear several times in the batch
+    vectors = {}
+    to_embed = {}
+    for key, text in zip(keys, texts):
+        if key in vectors or key in to_embed:
+            continue
+        cached = EMBEDDING_CACHE.get(key)
+        if cached is not None:
+            EMBEDDING_CACHE.move_to_end(key)
+            vectors[key] = cached.tolist()
+        else:
+            to_embed[key] = text
+    missing_keys = list(to_embed)
+    missing_texts = list(to_embed.values())
+    chunks = [missing_texts[i:i + OLLAMA_EMBED_CHUNK] for i in range(0, len(missing_texts), OLLAMA_EMBED_CHUNK)]
+    print(f"Generating {len(missing_texts)} embeddings in {len(chunks)} requests ({len(texts) - len(missing_texts)} reused)...")
+    semaphore = asyncio.Semaphore(OLLAMA_CONCURRENCY)
+    chunk_results = await asyncio.gather(
+        *(generate_chunk_embeddings(session, semaphore, chunk) for chunk in chunks)
+    )
+    results = [result for chunk_result in chunk_results for result in chunk_result]
+    vector_size = next((len(r) for r in results if not isinstance(r, Exception)), None)
+    if vector_size is None and EMBEDDING_CACHE:
+        vector_size = len(next(iter(EMBEDDING_CACHE.values())))
+    # One shared fallback vector; it is never mutated, so every failed text can point to it
+    zero_vector = [0.0] * vector_size if vector_size is not None else None
+    failed = set()
+    for i, (key, result) in enumerate(zip(missing_keys, results)):
+        if isinstance(result, Exception):
+            print(f"Failed to generate embedding for text {i+1}: {result}")
+            # Use a zero vector as a fallback (same size as successful embeddings); it is not cached
+            if vector_size is None:
+                # If no embedding succeeded, we can't determine the size
+                raise result
+            failed.add(key)
+            vectors[key] = zero_vector
+        else:
+            vectors[key] = result
+            EMBEDDING_CACHE[key] = array("f", result)
+            if len(EMBEDDING_CACHE) > EMBEDDING_CACHE_SIZE:
+                EMBEDDING_CACHE.popitem(last=False)
+    embeddings = [vectors[key] for key in keys]
+    return embeddings, sum(key in failed for key in keys)
+
+async def store_in_qdrant(points: List[PointStruct], client: AsyncQdrantClient) -> bool:
     for attempt in range(MAX_RETRIES):
         try:
-            if not client.collection_exists(COLLECTION_NAME):
-                print(f"Collection '{COLLECTION_NAME}' does not exist. Cannot store points.")
-                return False
-            client.upsert(collection_name=COLLECTION_NAME, points=points)
+            # The collection is ensured once in main (create_collection_if_not_exists), not per batch
+            # wait=False: Qdrant acknowledges once the points are received, indexing continues in the background
+            await client.upsert(collection_name=COLLECTION_NAME, points=points, wait=False)
             return True
         except Exception as e:
             print(f"Attempt {attempt+1} failed to store points: {e}")
             if attempt < MAX_RETRIES - 1:
                 print(f"Retrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
+                await asyncio.sleep(RETRY_DELAY)
             else:
                 print("Max retries reached. Could not store points.")
                 return False
     return False
 
-def connect_to_local_qdrant() -> Optional[QdrantClient]:
+async def connect_to_local_qdrant() -> Optional[AsyncQdrantClient]:
     print(f"Attempting to connect to local Qdrant at {LOCAL_QDRANT_HOST}:{LOCAL_QDRANT_PORT}")
     for attempt in range(MAX_RETRIES):
         try:
-            client = QdrantClient(host=LOCAL_QDRANT_HOST, port=LOCAL_QDRANT_PORT)
-            client.get_collections()
+            client = AsyncQdrantClient(host=LOCAL_QDRANT_HOST, port=LOCAL_QDRANT_PORT, grpc_port=LOCAL_QDRANT_GRPC_PORT, prefer_grpc=True)
+            await client.get_collections()
             print("Successfully connected to local Qdrant")
             return client
         except Exception as e:
             print(f"Connection attempt {attempt+1} failed: {e}")
             if attempt < MAX_RETRIES - 1:
                 print(f"Retrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
+                await asyncio.sleep(RETRY_DELAY)
             else:
                 print(f"""
 ---------------------------------------------------------
@@ -127,11 +265,11 @@ Please make sure that:
                 return None
     return None
 
-def create_collection_if_not_exists(client: QdrantClient, vector_size: int) -> bool:
+async def create_collection_if_not_exists(client: AsyncQdrantClient, vector_size: int) -> bool:
     try:
-        if not client.collection_exists(COLLECTION_NAME):
+        if not await client.collection_exists(COLLECTION_NAME):
             print(f"Creating collection '{COLLECTION_NAME}'")
-            client.create_collection(
+            await client.create_collection(
                 collection_name=COLLECTION_NAME,
                 vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
             )
@@ -149,9 +287,9 @@ def test_ollama_connection() -> Optional[int]:
         print(f"Testing connection to Ollama API at {OLLAMA_API_BASE}...")
         
         # Test Ollama API availability
-        response = requests.get(f"{OLLAMA_API_BASE}/api/tags")
+        response = SESSION.get(f"{OLLAMA_API_BASE}/api/tags")
         response.raise_for_status()
-        tags = response.json()
+        tags = orjson.loads(response.content)
         print(f"Ollama server is running with models: {[model['name'] for model in tags.get('models', [])]}")
         
         # Test embedding generation with a simple text
@@ -177,7 +315,7 @@ def test_ollama_connection() -> Optional[int]:
         print(f"Error testing Ollama connection: {e}")
         return None
 
-def main():
+async def main():
     # Test Ollama API connection
     vector_size = test_ollama_connection()
     if vector_size is None:
@@ -185,95 +323,161 @@ def main():
         return
 
     # Connect to local Qdrant
-    client = connect_to_local_qdrant()
+    client = await connect_to_local_qdrant()
     if client is None:
         print("Exiting due to local Qdrant connection failure.")
         return
 
+    try:
+        async with create_ollama_session() as session:
+            await run_pipeline(client, session, vector_size)
+    finally:
+        await client.close()
+
+async def run_pipeline(client: AsyncQdrantClient, session: aiohttp.ClientSession, vector_size: int):
     # Create collection if needed
-    if not create_collection_if_not_exists(client, vector_size):
+    if not await create_collection_if_not_exists(client, vector_size):
         print("Exiting due to collection creation failure.")
         return
 
-    print(f"Scanning for markdown files in '{MARKDOWN_DIR}'...")
-    md_files = list(Path(MARKDOWN_DIR).rglob("*.md"))
-    print(f"Found {len(md_files)} markdown files")
-
-    if not md_files:
-        print(f"No markdown files found in '{MARKDOWN_DIR}'. Please check the directory path.")
-        return
-
     points = []
     successful_files = 0
     failed_files = 0
+    batch_number = 0
+
+    # Upserts run as tasks on the same event loop as the embedding requests;
+    # the slot is taken before the task starts, so at most QDRANT_UPLOAD_CONCURRENCY batches wait in memory
+    upload_slots = asyncio.Semaphore(QDRANT_UPLOAD_CONCURRENCY)
+    upload_tasks = []
+
+    async def upload_batch(qdrant_points: List[PointStruct], number: int, fallback_count: int):
+        nonlocal successful_files, failed_files
+        try:
+            if await store_in_qdrant(qdrant_points, client):
+                # Points stored with a zero-vector fallback are not searchable, so they count as failed
+                successful_files += len(qdrant_points) - fallback_count
+                failed_files += fallback_count
+                print(f"Successfully processed batch {number}: {len(qdrant_points)} points")
+                if fallback_count:
+                    print(f"  {fallback_count} of them were stored with a zero vector (embedding failed)")
+            else:
+                failed_files += len(qdrant_points)
+                print(f"Failed to process batch {number}")
+        finally:
+            upload_slots.release()
+
+    async def process_batch():
+        nonlocal points, batch_number
+        batch_number += 1
+        print(f"Processing batch of {len(points)} documents...")
+        texts = [p["text"] for p in points]
+
+        print(f"Getting embeddings from Ollama API at {OLLAMA_API_BASE}...")
+        embeddings, fallback_count = await generate_embeddings_batch(session, texts)
+
+        qdrant_points = [
+            PointStruct(
+                id=p["id"],
+                vector=embedding,
+                payload=p["metadata"]
+            )
+            for p, embedding in zip(points, embeddings)
+        ]
+        points = []
+
+        print(f"Storing {len(qdrant_points)} points in local Qdrant...")
+        await upload_slots.acquire()
+        upload_tasks.append(asyncio.create_task(upload_batch(qdrant_points, batch_number, fallback_count)))
+
+    # Files are discovered while the tree is walked (paths normalized like rglob's) and converted in
+    # worker processes, at most READ_AHEAD ahead of the embedding requests made below
+    print(f"Scanning for markdown files in '{MARKDOWN_DIR}'...")
+    md_files = iter_markdown_files(os.path.normpath(MARKDOWN_DIR))
+    executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+    pending_reads = deque()
 
-    for i, file_path in enumerate(md_files):
+    def submit_next_read():
+        entry = next(md_files, None)
+        if entry is None:
+            return
         try:
-            text, metadata = read_markdown_file(str(file_path))
-            if not text:
-                print(f"Skipping empty file: {file_path}")
-                continue
-
-            group_key = get_group_key(metadata)
-            point_id = str(uuid.uuid4())
-
-            point = {
-                "id": point_id,
-                "text": text,
-                "metadata": {
-                    **metadata,
-                    "group": group_key
+            is_empty = entry.stat().st_size == 0
+        except OSError:
+            is_empty = False  # Let the read report the error
+        # Empty files are never sent to the pool; whitespace-only ones are caught by read_markdown_file
+        read_future = None if is_empty else executor.submit(read_markdown_file_or_error, entry.path)
+        pending_reads.append((entry.path, read_future))
+
+    # The pool is shut down however the loop ends; queued conversions are dropped on an error or cancellation
+    try:
+        for _ in range(READ_AHEAD):
+            submit_next_read()
+
+        if not pending_reads:
+            print(f"No markdown files found in '{MARKDOWN_DIR}'. Please check the directory path.")
+            return
+
+        i = -1
+        while pending_reads:
+            i += 1
+            file_path, read_future = pending_reads.popleft()
+            submit_next_read()
+            try:
+                if read_future is None:
+                    print(f"Skipping empty file: {file_path}")
+                    continue
+                read_result = await asyncio.wrap_future(read_future)
+                if isinstance(read_result, Exception):
+                    raise read_result
+                text, metadata = read_result
+                if not text:
+                    print(f"Skipping empty file: {file_path}")
+                    continue
+
+                point_id = str(uuid.uuid5(POINT_ID_NAMESPACE, file_path))
+
+                # The metadata dict becomes the Qdrant payload as is, so it is completed once here
+                metadata["group"] = get_group_key(metadata)
+                metadata["text"] = text[:1000]
+                point = {
+                    "id": point_id,
+                    "text": text,
+                    "metadata": metadata
                 }
-            }
-            points.append(point)
-
-            if len(points) >= BATCH_SIZE or i == len(md_files) - 1:
-                print(f"Processing batch of {len(points)} documents...")
-                texts = [p["text"] for p in points]
-
-                print(f"Getting embeddings from Ollama API at {OLLAMA_API_BASE}...")
-                embeddings = generate_embeddings_batch(texts)
-
-                qdrant_points = [
-                    PointStruct(
-                        id=p["id"],
-                        vector=embedding,
-                        payload={
-                            **p["metadata"],
-                            "text": p["text"][:1000]
-                        }
-                    )
-                    for p, embedding in zip(points, embeddings)
-                ]
-
-                print(f"Storing {len(qdrant_points)} points in local Qdrant...")
-                if store_in_qdrant(qdrant_points, client):
-                    successful_files += len(points)
-                    print(f"Successfully processed batch {i // BATCH_SIZE + 1}: {len(points)} points")
-                else:
-                    failed_files += len(points)
-                    print(f"Failed to process batch {i // BATCH_SIZE + 1}")
+                points.append(point)
 
-                points = []
+                if len(points) >= BATCH_SIZE:
+                    await process_batch()
 
-            if (i + 1) % 10 == 0 or i == len(md_files) - 1:
-                progress = (i + 1) / len(md_files) * 100
-                print(f"Progress: {progress:.1f}% ({i + 1}/{len(md_files)} files)")
+                if (i + 1) % 10 == 0 or not pending_reads:
+                    print(f"Progress: {i + 1} files processed")
 
+            except Exception as e:
+                failed_files += 1
+                print(f"Error processing {file_path}: {e}")
+
+        try:
+            if points:
+                await process_batch()
         except Exception as e:
-            failed_files += 1
-            print(f"Error processing {file_path}: {e}")
+            failed_files += len(points)
+            print(f"Error processing final batch: {e}")
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    await asyncio.gather(*upload_tasks)
 
     print("\n" + "="*50)
     print("Processing complete!")
+    print(f"Markdown files found: {i + 1}")
     print(f"Successfully processed: {successful_files} files")
     print(f"Failed to process: {failed_files} files")
     print("="*50)
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\nProcess interrupted by user. Exiting.")
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+        print(f"An unexpected error occurred: {e}")
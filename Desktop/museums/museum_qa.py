@@ -1,6 +1,10 @@
+import functools
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance
+from qdrant_client.http.models import QueryRequest
+from concurrent.futures import ThreadPoolExecutor
 import time
 from typing import Optional, List
 
@@ -13,6 +17,19 @@ LOCAL_QDRANT_HOST = "localhost"
 LOCAL_QDRANT_PORT = 6333
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+GENERATION_CONCURRENCY = 4  # Answers generated at once by query_museum_batch
+ANSWER_END = "\n\n"  # The streamed answer is cut at the first paragraph break
+
+# One pooled keep-alive session for every Ollama call instead of a new connection per request,
+# created on first use so importing this module for its helpers costs nothing
+@functools.lru_cache(maxsize=1)
+def get_session() -> requests.Session:
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0))
+    return session
+
+# Request bodies are encoded and responses decoded with orjson rather than the stdlib json module
+JSON_HEADERS = {"Content-Type": "application/json"}
 
 # Initialize Qdrant client
 def connect_to_local_qdrant() -> Optional[QdrantClient]:
@@ -34,26 +51,30 @@ def connect_to_local_qdrant() -> Optional[QdrantClient]:
                 return None
     return None
 
-# Generate embedding
-def generate_ollama_embedding(text: str) -> List[float]:
+# Generate embeddings, all texts in one /api/embed request
+def generate_ollama_embeddings(texts: List[str]) -> List[List[float]]:
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(
-                f"{OLLAMA_API_BASE}/api/embeddings",
-                json={"model": EMBED_MODEL, "prompt": text},
+            response = get_session().post(
+                f"{OLLAMA_API_BASE}/api/embed",
+                data=orjson.dumps({"model": EMBED_MODEL, "input": texts}),
+                headers=JSON_HEADERS,
                 timeout=30
             )
             response.raise_for_status()
-            result = response.json()
-            return result.get("embedding", [0.0] * 768)
-        except requests.exceptions.RequestException as e:
+            result = orjson.loads(response.content)
+            return result.get("embeddings", [[0.0] * 768 for _ in texts])
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"Embedding attempt {attempt+1} failed: {e}")
             if attempt < MAX_RETRIES - 1:
                 time.sleep(RETRY_DELAY)
             else:
                 print("Max retries reached for embedding")
-                return [0.0] * 768
-    return [0.0] * 768
+                return [[0.0] * 768 for _ in texts]
+    return [[0.0] * 768 for _ in texts]
+
+def generate_ollama_embedding(text: str) -> List[float]:
+    return generate_ollama_embeddings([text])[0]
 
 # Query museum info
 def query_museum(client: QdrantClient, question: str) -> str:
@@ -69,6 +90,27 @@ def query_museum(client: QdrantClient, question: str) -> str:
         print(f"Qdrant query failed: {e}")
         return "Error: Could not retrieve information from Qdrant"
 
+    return answer_from_points(question, search_result)
+
+# Query museum info for several questions: one embedding request, one Qdrant round-trip,
+# then the answers generated concurrently
+def query_museum_batch(client: QdrantClient, questions: List[str]) -> List[str]:
+    question_embeddings = generate_ollama_embeddings(questions)
+
+    try:
+        search_results = client.query_batch_points(
+            collection_name=COLLECTION_NAME,
+            requests=[QueryRequest(query=embedding, limit=3, with_payload=True) for embedding in question_embeddings]
+        )
+    except Exception as e:
+        print(f"Qdrant query failed: {e}")
+        return ["Error: Could not retrieve information from Qdrant"] * len(questions)
+
+    with ThreadPoolExecutor(max_workers=GENERATION_CONCURRENCY) as pool:
+        return list(pool.map(answer_from_points, questions, [result.points for result in search_results]))
+
+# Answer a question from the points retrieved for it
+def answer_from_points(question: str, search_result: list) -> str:
     context = "\n".join(point.payload.get("text", "")[:1000] for point in search_result)
     if not context:
         return "No relevant information found"
@@ -81,22 +123,37 @@ Keep it concise and accurate."""
     
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(
+            # Tokens are streamed as JSON lines; closing the response once the answer is complete
+            # drops the connection, which makes Ollama stop generating
+            with get_session().post(
                 f"{OLLAMA_API_BASE}/api/generate",
-                json={
+                data=orjson.dumps({
                     "model": TEXT_MODEL,
                     "prompt": prompt,
                     "max_tokens": 150,
-                    "stream": False
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("response", "No response from model").strip()
-        except requests.exceptions.RequestException as e:
+                    "stream": True
+                }),
+                headers=JSON_HEADERS,
+                timeout=30,
+                stream=True
+            ) as response:
+                if not response.ok:
+                    print(f"Response text: {response.text}")
+                response.raise_for_status()
+                answer = ""
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    answer += chunk.get("response", "")
+                    if ANSWER_END in answer.lstrip():
+                        answer = answer.lstrip().split(ANSWER_END, 1)[0]
+                        break
+                    if chunk.get("done"):
+                        break
+            return answer.strip() or "No response from model"
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"Generation attempt {attempt+1} failed: {e}")
-            print(f"Response text: {response.text if 'response' in locals() else 'No response'}")
             if attempt < MAX_RETRIES - 1:
                 time.sleep(RETRY_DELAY)
             else:
@@ -107,15 +164,15 @@ Keep it concise and accurate."""
 # Test Ollama connection
 def test_ollama_connection() -> bool:
     try:
-        response = requests.get(f"{OLLAMA_API_BASE}/api/tags", timeout=10)
+        response = get_session().get(f"{OLLAMA_API_BASE}/api/tags", timeout=10)
         response.raise_for_status()
-        models = [model["name"] for model in response.json().get("models", [])]
+        models = [model["name"] for model in orjson.loads(response.content).get("models", [])]
         print(f"Ollama models: {models}")
         if EMBED_MODEL not in models or TEXT_MODEL not in models:
             print(f"Required models ({EMBED_MODEL}, {TEXT_MODEL}) not found")
             return False
         return True
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         print(f"Ollama connection failed: {e}")
         return False
 
@@ -139,7 +196,6 @@ if __name__ == "__main__":
         "Is there a shop in there ?"
     ]
 
-    for question in questions:
-        answer = query_museum(client, question)
+    for question, answer in zip(questions, query_museum_batch(client, questions)):
         print(f"Q: {question}")
         print(f"A: {answer}\n")
\ No newline at end of file
@@ -1,5 +1,9 @@
-import json
 import os
+import ijson
+import orjson
+
+# Deletes the parentheses around the review count in a single pass
+_PARENS_TABLE = str.maketrans("", "", "()")
 
 def clean_and_rename_restaurant_data(data):
     """
@@ -12,38 +16,71 @@ def clean_and_rename_restaurant_data(data):
     Returns:
         list: A new list of dictionaries with cleaned and renamed fields.
     """
-    cleaned_data = []
+    return list(iter_cleaned_restaurant_data(data))
+
+def iter_cleaned_restaurant_data(data):
+    """
+    Generator version of clean_and_rename_restaurant_data.
+
+    Args:
+        data (iterable): Restaurant dictionaries, e.g. streamed from the input file.
+
+    Yields:
+        dict: Each restaurant with cleaned and renamed fields.
+    """
     for item in data:
+        # Each field is looked up once and reused from a local
+        get = item.get
+        field7 = get("Field7")
+        field8 = get("Field8")
+        field9 = get("Field9")
         features_list = []
 
-        if item.get("Field7"):
-            features_list.append(item["Field7"])
-        if item.get("Field8"):
-            features_list.append(item["Field8"])
-        if item.get("Field9") and "FriendVegan" in item["Field9"]:
+        if field7:
+            features_list.append(field7)
+        if field8:
+            features_list.append(field8)
+        if field9 and "FriendVegan" in field9:
              features_list.append("Vegan-friendly")
 
-        new_item = {
-            "name": item.get("Title"),
-            "url": item.get("Title_URL"),
-            "image_url": item.get("Image"),
-            "rating": item.get("mr1"),
-            "review_count": item.get("flex").replace("(", "").replace(")", "") if item.get("flex") else None,
-            "cuisine_type": item.get("lineclamp1"),
-            "status": item.get("flex1"),
-            "abstract": item.get("Abstract"),
-            "full_description": item.get("textgray800"),
-            "phone_number": item.get("Number").replace("tel:", "") if item.get("Number") else None,
-            "address": item.get("fontnormal"),
-            "website": item.get("Field2"),
-            "delivery_link": item.get("Field6_links") if item.get("Field6_text") == "Delivery" else None,
+        flex = get("flex")
+        number = get("Number")
+        yield {
+            "name": get("Title"),
+            "url": get("Title_URL"),
+            "image_url": get("Image"),
+            "rating": get("mr1"),
+            "review_count": flex.translate(_PARENS_TABLE) if flex else None,
+            "cuisine_type": get("lineclamp1"),
+            "status": get("flex1"),
+            "abstract": get("Abstract"),
+            "full_description": get("textgray800"),
+            "phone_number": number.replace("tel:", "") if number else None,
+            "address": get("fontnormal"),
+            "website": get("Field2"),
+            "delivery_link": get("Field6_links") if get("Field6_text") == "Delivery" else None,
             "features": features_list,
-            "thumbnail_images": [
-                img for img in [item.get("Field11"), item.get("Field12"), item.get("Field13")] if img
-            ]
+            "thumbnail_images": list(filter(None, (get("Field11"), get("Field12"), get("Field13"))))
         }
-        cleaned_data.append(new_item)
-    return cleaned_data
+
+def first_json_byte(f):
+    """Returns the first non-whitespace byte of a binary file (b'' if there is none) and rewinds it."""
+    while True:
+        b = f.read(1)
+        if not b or not b.isspace():
+            f.seek(0)
+            return b
+
+def write_json_array(f, items):
+    """Writes items to a binary file as an indented JSON array, one item at a time."""
+    f.write(b"[")
+    empty = True
+    for item in items:
+        f.write(b"\n  " if empty else b",\n  ")
+        # Newlines only occur between tokens in orjson's output, so this nests the item one level
+        f.write(orjson.dumps(item, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  "))
+        empty = False
+    f.write(b"]" if empty else b"\n]")
 
 def main():
     input_file_name = "vegan_resto.json"
@@ -54,33 +91,48 @@ def main():
         print("Please make sure 'vegan_resto.json' is in the same folder as this script.")
         return
 
+    # A top-level array is streamed item by item, so neither the raw nor the cleaned list is held in memory
     try:
-        with open(input_file_name, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from '{input_file_name}'. Please ensure it's a valid JSON file.")
-        return
+        input_file = open(input_file_name, 'rb')
     except Exception as e:
         print(f"An unexpected error occurred while reading '{input_file_name}': {e}")
         return
 
-    if not isinstance(raw_data, list):
-        print(f"Warning: The root of '{input_file_name}' is not a list. The script expects a JSON array of restaurant objects.")
-        if isinstance(raw_data, dict):
-            print("Attempting to process it as a single restaurant object within a list.")
-            raw_data = [raw_data]
+    with input_file:
+        if first_json_byte(input_file) == b"[":
+            raw_data = ijson.items(input_file, 'item', use_float=True)
         else:
-            print("Error: The script cannot process the input JSON format. It must be a list of objects or a single dictionary object.")
-            return
+            try:
+                raw_data = orjson.loads(input_file.read())
+            except orjson.JSONDecodeError:
+                print(f"Error: Could not decode JSON from '{input_file_name}'. Please ensure it's a valid JSON file.")
+                return
+            except Exception as e:
+                print(f"An unexpected error occurred while reading '{input_file_name}': {e}")
+                return
 
-    processed_data = clean_and_rename_restaurant_data(raw_data)
+            print(f"Warning: The root of '{input_file_name}' is not a list. The script expects a JSON array of restaurant objects.")
+            if isinstance(raw_data, dict):
+                print("Attempting to process it as a single restaurant object within a list.")
+                raw_data = [raw_data]
+            else:
+                print("Error: The script cannot process the input JSON format. It must be a list of objects or a single dictionary object.")
+                return
 
-    try:
-        with open(output_file_name, 'w', encoding='utf-8') as f:
-            json.dump(processed_data, f, indent=4, ensure_ascii=False)
-        print(f"Successfully processed data from '{input_file_name}' and saved to '{output_file_name}' in the current directory.")
-    except Exception as e:
-        print(f"An error occurred while writing the output file '{output_file_name}': {e}")
+        processed_data = iter_cleaned_restaurant_data(raw_data)
+
+        try:
+            with open(output_file_name, 'wb') as f:
+                write_json_array(f, processed_data)
+            print(f"Successfully processed data from '{input_file_name}' and saved to '{output_file_name}' in the current directory.")
+        except Exception as e:
+            # The output is written while the input is still being read, so do not leave a truncated file behind
+            if os.path.exists(output_file_name):
+                os.remove(output_file_name)
+            if isinstance(e, ijson.JSONError):
+                print(f"Error: Could not decode JSON from '{input_file_name}'. Please ensure it's a valid JSON file.")
+            else:
+                print(f"An error occurred while writing the output file '{output_file_name}': {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file